@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# @Author      : Cao Zejun
+# @Time        : 2026/10/18 20:30
+# @File        : wechat_throttle.py
+# @Software    : Pycharm
+# @description : mp.weixin.qq.com 接口的令牌桶限速，多进程共享状态，触发 freq control 时乘性降速
+'''
+公众号后台接口（searchbiz、appmsgpublish）按账号限频，超过后返回 freq control，需要等一段时间才能恢复。
+原来 woa 遇到 freq control 直接抛异常，wz 的 wechat_crawler 每个公众号之间固定 sleep(1)，都不会根据限频调整速度。
+
+这里用令牌桶控制请求速度，速率按 AIMD 调整：
+- 每次请求成功，速率加 increase（加性增）
+- 遇到 freq control，速率乘以 decrease（乘性减），清空令牌，并暂停 cooldown 秒
+- 速率限制在 [min_rate, max_rate] 之间
+状态（令牌数、当前速率、暂停截止时间）保存在 sqlite 中，同一台机器上的多个进程（woa 和 wz 的爬虫）共享同一个桶，
+学到的速率也会保留到下次运行。
+
+只依赖标准库，作为独立的包安装，woa 和 wz 都从这里导入：pip install -e ./wechat-throttle
+'''
+from pathlib import Path
+import os
+import sqlite3
+import tempfile
+import time
+
+# 默认状态文件放在系统临时目录，woa 和 wz 都能访问到
+DEFAULT_STATE_PATH = Path(os.environ.get('WECHAT_RATE_STATE', Path(tempfile.gettempdir()) / 'wechat_mp_rate_limit.db'))
+
+
+class FreqControlError(Exception):
+    pass
+
+
+class TokenBucket:
+    '''
+    多进程共享的令牌桶
+    :param name: 桶的名字，同名的桶共享状态
+    :param rate: 初始速率（每秒请求数），已有状态时以保存的速率为准
+    :param capacity: 桶容量，允许的最大突发请求数
+    :param min_rate: 最低速率
+    :param max_rate: 最高速率
+    :param increase: 每次成功后速率的增量
+    :param decrease: 触发限频后速率的乘数
+    :param cooldown: 触发限频后暂停的秒数
+    :param state_path: sqlite 状态文件路径
+    '''
+    def __init__(self, name='mp.weixin.qq.com', rate=0.3, capacity=3, min_rate=0.02, max_rate=1.0,
+                 increase=0.01, decrease=0.5, cooldown=60, state_path=DEFAULT_STATE_PATH):
+        self.name = name
+        self.capacity = capacity
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.state_path = Path(state_path)
+
+        with self._transaction() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS bucket (name TEXT PRIMARY KEY, tokens REAL, rate REAL, '
+                         'updated REAL, blocked_until REAL)')
+            conn.execute('INSERT OR IGNORE INTO bucket VALUES (?, ?, ?, ?, 0)', (name, capacity, rate, time.time()))
+
+    def _transaction(self):
+        # BEGIN IMMEDIATE 在读之前就加写锁，保证多进程的"读-改-写"不会交错
+        conn = sqlite3.connect(self.state_path, timeout=30, isolation_level=None)
+        return _Transaction(conn)
+
+    def _load(self, conn, now):
+        tokens, rate, updated, blocked_until = conn.execute(
+            'SELECT tokens, rate, updated, blocked_until FROM bucket WHERE name = ?', (self.name,)).fetchone()
+        # 保存的速率可能来自参数不同的其他进程，按本对象的上下限截断
+        rate = min(self.max_rate, max(self.min_rate, rate))
+        tokens = min(self.capacity, tokens + max(0.0, now - updated) * rate)
+        return tokens, rate, blocked_until
+
+    def _save(self, conn, tokens, rate, now, blocked_until):
+        conn.execute('UPDATE bucket SET tokens = ?, rate = ?, updated = ?, blocked_until = ? WHERE name = ?',
+                     (tokens, rate, now, blocked_until, self.name))
+
+    def acquire(self):
+        '''取一个令牌，没有令牌或处于暂停期时阻塞等待，返回等待的秒数'''
+        waited = 0.0
+        while True:
+            with self._transaction() as conn:
+                now = time.time()
+                tokens, rate, blocked_until = self._load(conn, now)
+                if now < blocked_until:
+                    wait = blocked_until - now
+                    tokens = 0.0
+                elif tokens >= 1:
+                    self._save(conn, tokens - 1, rate, now, blocked_until)
+                    return waited
+                else:
+                    wait = (1 - tokens) / rate
+                self._save(conn, tokens, rate, now, blocked_until)
+            time.sleep(wait)
+            waited += wait
+
+    def on_success(self):
+        '''请求成功，加性增加速率'''
+        with self._transaction() as conn:
+            now = time.time()
+            tokens, rate, blocked_until = self._load(conn, now)
+            self._save(conn, tokens, min(self.max_rate, rate + self.increase), now, blocked_until)
+
+    def on_throttle(self):
+        '''触发 freq control，乘性降低速率，清空令牌并暂停 cooldown 秒'''
+        with self._transaction() as conn:
+            now = time.time()
+            _, rate, blocked_until = self._load(conn, now)
+            self._save(conn, 0.0, max(self.min_rate, rate * self.decrease), now, max(blocked_until, now + self.cooldown))
+
+    def budget(self):
+        '''当前预算：速率（每秒请求数）、可立即使用的令牌数、暂停剩余秒数'''
+        with self._transaction() as conn:
+            now = time.time()
+            tokens, rate, blocked_until = self._load(conn, now)
+        return {
+            'rate': rate,
+            'tokens': tokens if now >= blocked_until else 0.0,
+            'capacity': self.capacity,
+            'blocked_for': max(0.0, blocked_until - now),
+        }
+
+    def call(self, func, *args, max_retries=3, **kwargs):
+        '''
+        限速调用 func，func 抛出 FreqControlError（或其子类）时降速后重试
+        :return: func 的返回值，重试 max_retries 次仍被限频则抛出最后一次的异常
+        '''
+        for retry in range(max_retries + 1):
+            self.acquire()
+            try:
+                result = func(*args, **kwargs)
+            except FreqControlError:
+                self.on_throttle()
+                if retry == max_retries:
+                    raise
+                continue
+            self.on_success()
+            return result
+
+
+class _Transaction:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+        return self.conn
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        try:
+            self.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+        finally:
+            self.conn.close()
+
+
+if __name__ == '__main__':
+    # 查看当前预算：python -m wechat_throttle
+    print(TokenBucket().budget())
@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# @Author      : Cao Zejun
+# @Time        : 2026/10/20 16:20
+# @File        : bench_dedup.py
+# @Software    : Pycharm
+# @description : 去重流程的离线 benchmark，分阶段计时、吞吐量、峰值内存，以及对照标注的准确率和召回率
+'''
+通过 ReplayServer 回放录制好的语料，在临时目录中建立 message_info、issues_message 和索引，
+直接调用 minHashLSH.write_vector 跑一遍去重（不影响 data 中的文件），分阶段统计：
+- url2text：请求页面并提取正文，写入临时目录的正文存储（相当于爬取时的预取）
+- write_vector：整个去重流程，以下阶段都包含在其中
+  - minhash：BatchMinHash 批量计算签名（包括分词）
+  - lsh_query：在线索引和冷索引的查询
+  - lsh_insert：插入在线索引
+  - confirm_dup：候选文章的 jaccard 和规则复核
+每个阶段输出耗时和吞吐量（篇/秒），最后输出进程峰值内存和重复判断的 precision / recall。
+
+python benchmark/bench_dedup.py benchmark/corpus --save benchmark/baseline.json
+修改 filter_duplication.py 后：
+python benchmark/bench_dedup.py benchmark/corpus --compare benchmark/baseline.json
+'''
+from contextlib import contextmanager
+from pathlib import Path
+import argparse
+import json
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from corpus import load
+from replay_server import ReplayServer
+from util.filter_duplication import minHashLSH, url2text
+from util.util import handle_json
+
+try:
+    import resource
+except ImportError:
+    # windows 没有 resource 模块，不统计峰值内存
+    resource = None
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    # linux 下 ru_maxrss 单位为 KB，macOS 为字节
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1 << 20) if sys.platform == 'darwin' else rss / 1024
+
+
+class StageTimer:
+    def __init__(self):
+        self.seconds = {}
+        self.items = {}
+
+    @contextmanager
+    def stage(self, name, items=1):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] = self.seconds.get(name, 0.0) + time.perf_counter() - start
+            self.items[name] = self.items.get(name, 0) + items
+
+    def wrap(self, obj, method, name=None, count=None):
+        '''替换 obj 的方法，每次调用计入 name 阶段；count 根据返回值计算处理的篇数，默认每次调用 1 篇'''
+        fn = getattr(obj, method)
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            result = fn(*args, **kwargs)
+            key = name or method
+            self.seconds[key] = self.seconds.get(key, 0.0) + time.perf_counter() - start
+            self.items[key] = self.items.get(key, 0) + (count(result) if count else 1)
+            return result
+
+        setattr(obj, method, timed)
+
+    def report(self):
+        return {name: {'seconds': round(s, 4), 'items': self.items[name],
+                       'per_second': round(self.items[name] / s, 2) if s else None}
+                for name, s in self.seconds.items()}
+
+
+def run(corpus_dir, threshold=0.8):
+    articles, labels = load(corpus_dir)
+    articles.sort(key=lambda x: x['create_time'])
+    timer = StageTimer()
+
+    with ReplayServer(corpus_dir) as server, tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        # 1. 临时目录中的 message_info 和 issues_message，链接指向回放服务
+        blogs = [{'id': a['id'], 'title': a['title'], 'link': server.url(a['file']), 'create_time': a['create_time']}
+                 for a in articles]
+        handle_json(tmp / 'message_info.json', data={'benchmark': {'blogs': blogs}})
+        handle_json(tmp / 'issues_message.json', data={'is_delete': [], 'dup_minhash': {}})
+
+        with minHashLSH(data_dir=tmp, threshold=threshold) as dedup:
+            # 2. 获取正文写入正文存储，write_vector 不再请求
+            texts = {}
+            for m in blogs:
+                with timer.stage('url2text'):
+                    texts[m['id']] = url2text(m['link'])
+                dedup.message_detail_text[m['id']] = texts[m['id']]
+
+            # 3. 去重，各阶段通过替换方法计时
+            timer.wrap(dedup.minhash, 'signatures', 'minhash', count=len)
+            timer.wrap(dedup.lsh, 'query', 'lsh_query')
+            timer.wrap(dedup.lsh, 'query_archive', 'lsh_query')
+            timer.wrap(dedup.lsh, 'insert', 'lsh_insert')
+            timer.wrap(dedup, 'confirm_dup')
+            with timer.stage('write_vector', items=len(articles)):
+                dedup.write_vector()
+            predicted = dict(dedup.issues_message['dup_minhash'])
+    valid = [a for a in articles if texts[a['id']] not in ['已删除', '请求错误']]
+
+    # 4. 对照标注：以文章是否被判为重复计算 precision / recall
+    # 转载与原文属于同一组，组内按发布时间第一篇有效文章之后的都应判为重复（原文已删除时第一篇转载视为首发）
+    truth = set()
+    seen = set()
+    for a in valid:
+        source = labels.get(a['id'], a['id'])
+        group = source if isinstance(source, str) else source[0]
+        if group in seen:
+            truth.add(a['id'])
+        seen.add(group)
+    tp = len(truth & set(predicted))
+    # 子阶段都包含在 write_vector 中，总耗时只计两个顶层阶段
+    total = timer.seconds['url2text'] + timer.seconds['write_vector']
+    return {
+        'articles': len(articles),
+        'valid': len(valid),
+        'stages': timer.report(),
+        'total_seconds': round(total, 4),
+        'articles_per_second': round(len(articles) / total, 2) if total else None,
+        'peak_rss_mb': peak_rss_mb(),
+        'predicted_dup': len(predicted),
+        'labeled_dup': len(truth),
+        'precision': round(tp / len(predicted), 4) if predicted else None,
+        'recall': round(tp / len(truth), 4) if truth else None,
+        'false_positive': sorted(set(predicted) - truth),
+        'false_negative': sorted(truth - set(predicted)),
+    }
+
+
+def print_report(result, baseline=None):
+    def delta(new, old):
+        if baseline is None or old is None or new is None:
+            return ''
+        return f'  ({(new - old) / old * 100:+.1f}%)' if old else ''
+
+    base_stages = baseline['stages'] if baseline else {}
+    print(f"{'stage':<12}{'seconds':>10}{'items':>8}{'items/s':>12}")
+    for name, s in result['stages'].items():
+        old = base_stages.get(name, {}).get('seconds')
+        print(f"{name:<12}{s['seconds']:>10.3f}{s['items']:>8}{s['per_second'] or 0:>12.1f}{delta(s['seconds'], old)}")
+    for key in ['total_seconds', 'articles_per_second', 'peak_rss_mb', 'predicted_dup', 'labeled_dup',
+                'precision', 'recall']:
+        old = baseline.get(key) if baseline else None
+        print(f'{key:<20}{result[key]}{delta(result[key], old)}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('corpus_dir')
+    parser.add_argument('--threshold', type=float, default=0.8, help='LSH 阈值')
+    parser.add_argument('--save', help='结果保存为 json，作为之后比较的基线')
+    parser.add_argument('--compare', help='与之前保存的基线结果比较')
+    args = parser.parse_args()
+
+    result = run(args.corpus_dir, threshold=args.threshold)
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
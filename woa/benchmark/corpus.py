@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# @Author      : Cao Zejun
+# @Time        : 2026/10/20 15:45
+# @File        : corpus.py
+# @Software    : Pycharm
+# @description : 生成 benchmark 用的文章语料：从线上录制，或者合成带标注的语料
+'''
+两种方式生成同样结构的语料目录（见 replay_server.py）：
+- record：按 message_info 录制真实文章的 html，只需联网执行一次，之后的测试全部离线回放。
+  labels.json 用 issues_message 中现有的 dup_minhash 结果初始化，需要人工复核后才能作为标注使用
+- synthesize：按公众号文章的 html 结构合成文章，包括
+  - 独立文章
+  - 转载（重复）：原文基础上改动少量字词、增删首尾的引导语和广告段落，标注为重复
+  - 系列文章：同一模板每天更新，共用开头结尾但正文不同，标注为不重复，用于检验误判
+  - 已删除：只有记录没有 html
+  完全离线，用于比较不同实现的速度和效果
+
+python benchmark/corpus.py synthesize benchmark/corpus --n 2000
+python benchmark/corpus.py record benchmark/corpus --n 2000 --since 2024-07-01
+'''
+from pathlib import Path
+import argparse
+import datetime
+import json
+import random
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# url2text 按这两个 class 查找正文所在的 div，换行和空格也必须相同
+CONTENT_CLASS = 'rich_media_content js_underline_content\n                       autoTypeSetting24psection\n            '
+
+# 合成正文用的汉字表，按 Zipf 分布取字，字频接近真实中文，不同文章的单字 jaccard 在 0.3~0.5 之间
+_CHARS = [chr(0x4e00 + i) for i in range(3000)]
+_WEIGHTS = [1 / (i + 1) for i in range(3000)]
+_PUNCT = '，，，。、；：！？'
+
+
+def article_html(title, paragraphs):
+    body = ''.join(f'<p>{p}</p>' for p in paragraphs)
+    return (f'<html><head><title>{title}</title></head><body>'
+            f'<h1 class="rich_media_title">{title}</h1>'
+            f'<div class="{CONTENT_CLASS}">{body}</div></body></html>')
+
+
+def _sentence(rng, n):
+    s = ''.join(rng.choices(_CHARS, _WEIGHTS, k=n))
+    # 随机插入标点和少量英文，接近真实文章的分词情况
+    s = list(s)
+    for i in range(rng.randint(1, 4)):
+        s.insert(rng.randrange(len(s)), rng.choice(_PUNCT))
+    if rng.random() < 0.3:
+        s.insert(rng.randrange(len(s)), rng.choice([' GPT-4 ', ' Python ', ' LLM ', ' GitHub ', ' 2024 ']))
+    return ''.join(s) + '。'
+
+
+def _paragraphs(rng, n):
+    return [''.join(_sentence(rng, rng.randint(15, 60)) for _ in range(rng.randint(1, 4))) for _ in range(n)]
+
+
+def _repost(rng, paragraphs, edit_rate):
+    '''转载：逐字按 edit_rate 替换，随机增删首尾段落'''
+    result = []
+    for p in paragraphs:
+        result.append(''.join(rng.choices(_CHARS, _WEIGHTS)[0] if rng.random() < edit_rate else c for c in p))
+    if rng.random() < 0.5:
+        result.insert(0, '点击上方蓝字关注我们' + _sentence(rng, 10))
+    if rng.random() < 0.5:
+        result.append('往期推荐' + _sentence(rng, 20))
+    if len(result) > 4 and rng.random() < 0.3:
+        result.pop(rng.randrange(1, len(result) - 1))
+    return result
+
+
+def synthesize(out_dir, n=2000, dup_ratio=0.2, series_ratio=0.1, delete_ratio=0.02, seed=0):
+    '''
+    合成语料
+    :param n: 文章总数
+    :param dup_ratio: 转载文章的比例
+    :param series_ratio: 系列文章的比例
+    :param delete_ratio: 已删除文章的比例
+    '''
+    rng = random.Random(seed)
+    out_dir = Path(out_dir)
+    (out_dir / 'html').mkdir(parents=True, exist_ok=True)
+    start = datetime.datetime(2024, 7, 1)
+    articles = []
+    originals = []
+    labels = {}
+    series_head, series_tail = _paragraphs(rng, 2), _paragraphs(rng, 2)
+    for i in range(n):
+        id_ = f'{1000000 + i}/{rng.randrange(10 ** 9)}_1'
+        file = f'{i}.html'
+        create_time = (start + datetime.timedelta(minutes=i * 37)).strftime('%Y-%m-%d %H:%M')
+        r = rng.random()
+        if originals and r < dup_ratio:
+            from_id, title, paragraphs = rng.choice(originals)
+            paragraphs = _repost(rng, paragraphs, edit_rate=rng.uniform(0, 0.08))
+            labels[id_] = from_id
+        elif r < dup_ratio + series_ratio:
+            title = '今日Github最火的10个Python项目'
+            paragraphs = series_head + _paragraphs(rng, rng.randint(4, 10)) + series_tail
+        else:
+            title = _sentence(rng, rng.randint(8, 20))
+            paragraphs = _paragraphs(rng, rng.randint(3, 15))
+            originals.append((id_, title, paragraphs))
+        if rng.random() >= delete_ratio:
+            with open(out_dir / 'html' / file, 'w', encoding='utf-8') as f:
+                f.write(article_html(title, paragraphs))
+        articles.append({'id': id_, 'title': title, 'create_time': create_time, 'file': file})
+    _save(out_dir, articles, labels)
+    return articles
+
+
+def record(out_dir, n=2000, since='2024-07-01', seed=0):
+    '''从线上录制 message_info 中 since 之后的 n 篇文章（需要联网）'''
+    from util.fetcher import session, DEFAULT_TIMEOUT
+    from util.message_reader import iter_messages
+    from util.util import handle_json, headers
+
+    out_dir = Path(out_dir)
+    (out_dir / 'html').mkdir(parents=True, exist_ok=True)
+    messages = [m for _, m in iter_messages(since=since)]
+    messages = random.Random(seed).sample(messages, min(n, len(messages)))
+    messages.sort(key=lambda x: x['create_time'])
+    articles = []
+    for i, m in enumerate(messages):
+        file = f'{i}.html'
+        response = session.get(m['link'], headers=headers, timeout=DEFAULT_TIMEOUT)
+        with open(out_dir / 'html' / file, 'w', encoding='utf-8') as f:
+            f.write(response.text)
+        articles.append({'id': m['id'], 'title': m['title'], 'create_time': m['create_time'], 'file': file})
+    # 现有的去重结果只是初始值，需要人工复核
+    ids = {a['id'] for a in articles}
+    dup = handle_json('issues_message').get('dup_minhash', {})
+    labels = {k: v['from_id'] for k, v in dup.items() if k in ids}
+    _save(out_dir, articles, labels)
+    return articles
+
+
+def _save(out_dir, articles, labels):
+    with open(out_dir / 'articles.jsonl', 'w', encoding='utf-8') as f:
+        f.writelines(json.dumps(a, ensure_ascii=False) + '\n' for a in articles)
+    with open(out_dir / 'labels.json', 'w', encoding='utf-8') as f:
+        json.dump({'dup': labels}, f, ensure_ascii=False, indent=2)
+
+
+def load(corpus_dir):
+    '''读取语料，返回 (文章列表, {重复文章id: 原文id 或 原文id列表})'''
+    corpus_dir = Path(corpus_dir)
+    with open(corpus_dir / 'articles.jsonl', 'r', encoding='utf-8') as f:
+        articles = [json.loads(line) for line in f if line.strip()]
+    with open(corpus_dir / 'labels.json', 'r', encoding='utf-8') as f:
+        labels = json.load(f)['dup']
+    return articles, labels
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('mode', choices=['synthesize', 'record'])
+    parser.add_argument('out_dir')
+    parser.add_argument('--n', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--since', default='2024-07-01')
+    args = parser.parse_args()
+    if args.mode == 'synthesize':
+        articles = synthesize(args.out_dir, n=args.n, seed=args.seed)
+    else:
+        articles = record(args.out_dir, n=args.n, since=args.since, seed=args.seed)
+    print(f'{len(articles)} articles written to {args.out_dir}')
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# @Author      : Cao Zejun
+# @Time        : 2026/10/20 15:30
+# @File        : replay_server.py
+# @Software    : Pycharm
+# @description : 本地 http 服务，回放录制好的文章 html，代替 mp.weixin.qq.com
+'''
+语料目录结构（由 corpus.py 生成）：
+- articles.jsonl：每行一篇文章 {"id", "title", "create_time", "file"}
+- html/<file>：文章页面的原始 html
+- labels.json：人工标注的重复关系 {"dup": {id: from_id}}
+
+ReplayServer 在后台线程中启动 ThreadingHTTPServer，/<file> 返回对应的 html，
+不存在的文件返回与文章删除时相同的提示页面，url2text 会按"已删除"处理。
+'''
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+import threading
+
+# 与 util.message_is_delete 判断的文案相同
+DELETED_HTML = '<html><body><div class="weui-msg__title warn">该内容已被发布者删除</div></body></html>'
+
+
+class _Handler(SimpleHTTPRequestHandler):
+    # 与公众号页面一样声明编码，否则 requests 会按 ISO-8859-1 解码
+    extensions_map = {**SimpleHTTPRequestHandler.extensions_map, '.html': 'text/html; charset=utf-8'}
+
+    def send_error(self, code, message=None, explain=None):
+        if code != 404:
+            return super().send_error(code, message, explain)
+        body = DELETED_HTML.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ReplayServer:
+    '''
+    with ReplayServer(corpus_dir) as server:
+        url2text(server.url(file))
+    '''
+    def __init__(self, corpus_dir, host='127.0.0.1', port=0):
+        handler = partial(_Handler, directory=str(Path(corpus_dir) / 'html'))
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def url(self, file):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}/{file}'
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.httpd.shutdown()
+        self.httpd.server_close()
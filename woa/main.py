@@ -6,11 +6,42 @@
 # @Software    : Pycharm
 # @description : 主程序，爬取文章并存储
 
+import sys
+
 from tqdm import tqdm
 from request_.wechat_request import WechatRequest, time_delta, time_now
 from util.message2md import message2md, single_message2md
-from util.util import handle_json
-from util.filter_duplication import minHashLSH
+from util.util import handle_json, patch_json, compact_json
+from util.fetcher import fetch_concurrently
+from util.activity import should_poll
+from util.valid_index import ValidIndex
+from util.filter_duplication import minHashLSH, update_title_head
+
+
+# 并发更新多个公众号的文章列表，请求速度由wechat_request.limiter统一控制
+# 每个公众号的新文章一到达就交给minhash预取正文并计算签名，每完成batch_size个公众号写入一次message_info
+def update_accounts(wechat_request, accounts, message_info, minhash, valid_index, workers=4, batch_size=10):
+    def update(item):
+        n, fakeid = item
+        return wechat_request.fakeid2message_update(fakeid, message_info[n]['blogs'])
+
+    new_messages = []
+    patches = []
+    try:
+        for (n, _), blogs in tqdm(fetch_concurrently(update, accounts, workers=workers), total=len(accounts)):
+            message_info[n]['blogs'].extend(blogs)
+            message_info[n]['latest_time'] = time_now()
+            new_messages.extend(blogs)
+            valid_index.add_messages(n, blogs)
+            minhash.prefetch(blogs)
+            patches += [('extend', [n, 'blogs'], blogs), ('set', [n, 'latest_time'], message_info[n]['latest_time'])]
+            if len(patches) >= 2 * batch_size:
+                patch_json('message_info', patches)
+                patches = []
+    finally:
+        # 中途失败时已完成的公众号也要写入
+        patch_json('message_info', patches)
+    return new_messages
 
 
 if __name__ == '__main__':
@@ -19,33 +50,54 @@ if __name__ == '__main__':
     message_info = handle_json('message_info')
 
     wechat_request = WechatRequest()
-    try:
-        for n, id in tqdm(name2fakeid_dict.items()):
-            # 如果是新增加的公众号
-            if not id:
-                name2fakeid_dict[n] = wechat_request.name2fakeid(n)
-                handle_json('name2fakeid', data=name2fakeid_dict)
-                message_info[n] = {
-                    'latest_time': "2000-01-01 00:00", # 默认一个很久远的时间
-                    'blogs': [],
-                }
-            # 如果latest_time非空（之前太久不发文章的），或者今天已经爬取过，则跳过
-            if message_info[n]['latest_time'] and time_delta(time_now(), message_info[n]['latest_time']).days < 1:
-                continue
-            message_info[n]['blogs'].extend(wechat_request.fakeid2message_update(id, message_info[n]['blogs']))
-            message_info[n]['latest_time'] = time_now()
-    except Exception as e:
-        # 写入message_info，如果请求中间失败，及时写入
-        handle_json('message_info', data=message_info)
-        raise e
-
-    # 写入message_info，如果请求顺利进行，则正常写入
-    handle_json('message_info', data=message_info)
+    new_messages = []  # 本次新爬取的文章，用于增量更新title_head
+    # 只和最近N天的文章比较去重：python main.py --window-days 180，更早的文章移入冷索引
+    window_days = int(sys.argv[sys.argv.index('--window-days') + 1]) if '--window-days' in sys.argv else None
+    # 有效文章索引，新文章在爬取时加入，删除和重复标记由去重时更新
+    with minHashLSH(window_days=window_days) as minhash, ValidIndex() as valid_index:
+        try:
+            accounts = []
+            skipped = 0
+            for n, id in name2fakeid_dict.items():
+                # 如果是新增加的公众号
+                if not id:
+                    name2fakeid_dict[n] = wechat_request.name2fakeid(n)
+                    handle_json('name2fakeid', data=name2fakeid_dict)
+                    message_info[n] = {
+                        'latest_time': "2000-01-01 00:00", # 默认一个很久远的时间
+                        'blogs': [],
+                    }
+                    patch_json('message_info', [('set', [n], message_info[n])])
+                # 回填历史文章：python main.py --backfill，中断后再次执行从上次的位置继续
+                if '--backfill' in sys.argv:
+                    for blogs in wechat_request.backfill_messages(name2fakeid_dict[n], message_info[n]['blogs']):
+                        message_info[n]['blogs'].extend(blogs)
+                        new_messages.extend(blogs)
+                        patch_json('message_info', [('extend', [n, 'blogs'], blogs)])
+                    # 回填的是更早的文章，按时间重新排序
+                    message_info[n]['blogs'].sort(key=lambda x: x['create_time'])
+                    patch_json('message_info', [('set', [n, 'blogs'], message_info[n]['blogs'])])
+                    valid_index.set_account(n, message_info[n]['blogs'])
+                    continue
+                # 如果latest_time非空（之前太久不发文章的），或者今天已经爬取过，则跳过
+                if message_info[n]['latest_time'] and time_delta(time_now(), message_info[n]['latest_time']).days < 1:
+                    continue
+                # 根据历史发文时间预测上次爬取后是否可能有新文章，不活跃的公众号降低请求频率，python main.py --all 时全部请求
+                if '--all' not in sys.argv and not should_poll(message_info[n]['blogs'], message_info[n]['latest_time'])[0]:
+                    skipped += 1
+                    continue
+                accounts.append((n, name2fakeid_dict[n]))
+            print(f'{len(accounts)} accounts to update, {skipped} skipped by activity model')
+            new_messages.extend(update_accounts(wechat_request, accounts, message_info, minhash, valid_index))
+        finally:
+            # 补丁合并回message_info.json和fetch_cursor.json，无论请求是否顺利
+            compact_json('message_info')
+            compact_json('fetch_cursor')
+            update_title_head(new_messages)
 
-    # 每次更新时验证去重
-    with minHashLSH() as minhash:
+        # 每次更新时验证去重，正文和签名在爬取过程中已经预取
         minhash.write_vector()
 
     # 将message_info转换为md上传到个人博客系统
     message2md(message_info)
-    single_message2md(message_info)
\ No newline at end of file
+    single_message2md(message_info)
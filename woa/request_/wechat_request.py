@@ -11,7 +11,11 @@ import json
 from lxml import etree
 import time
 import datetime
-from util.util import handle_json, headers
+import threading
+from util.util import handle_json, patch_json, headers
+from util.fetcher import DEFAULT_TIMEOUT
+from wechat_throttle import TokenBucket, FreqControlError
+
 
 # 将js获取的时间id转化成真实时间，截止到分钟
 def jstime2realtime(jstime):
@@ -31,6 +35,13 @@ class WechatRequest:
         self.headers = headers
         self.headers['Cookie'] = id_info['cookie']
         self.token = id_info['token']
+        # 所有后台接口请求共用的令牌桶，与其他进程（包括wz的爬虫）共享速率，触发频率限制时自动降速
+        self.limiter = TokenBucket()
+        self.max_retries = 3
+        # 多个线程同时发现session过期时只登录一次
+        self.login_lock = threading.Lock()
+        # 增量更新时第一页的大小
+        self.min_page_size = 5
 
     # 使用公众号名字获取 id 值
     def name2fakeid(self, name):
@@ -47,11 +58,7 @@ class WechatRequest:
 
         nickname = {}
         url = 'https://mp.weixin.qq.com/cgi-bin/searchbiz?'
-        response = requests.get(url=url, params=params, headers=self.headers).json()
-        if self.session_is_overdue(response):
-            params['token'] = self.token
-            response = requests.get(url=url, params=params, headers=headers).json()
-            self.session_is_overdue(response)
+        response = self.request_json(url, params)
         for l in response['list']:
             nickname[l['nickname']] = l['fakeid']
         if name in nickname.keys():
@@ -59,13 +66,14 @@ class WechatRequest:
         else:
             return None
 
-    # 请求次数限制，不是请求文章条数限制
-    def fakeid2message_update(self, fakeid, message_exist=[]):
+    # 请求文章列表的一页，begin为偏移量（按发布次数计），count最大为20
+    # 返回 (本页的发布列表, 该公众号总发布次数)
+    def fetch_message_page(self, fakeid, begin=0, count=20):
         params = {
             'sub': 'list',
             'search_field': 'null',
-            'begin': 0,
-            'count': 20,
+            'begin': begin,
+            'count': count,
             'query': '',
             'fakeid': fakeid,
             'type': '101_1',
@@ -76,39 +84,109 @@ class WechatRequest:
             'f': 'json',
             'ajax': 1,
         }
+        url = "https://mp.weixin.qq.com/cgi-bin/appmsgpublish?"
+        response = self.request_json(url, params)
+        publish_page = json.loads(response['publish_page'])
+        messages = [json.loads(m['publish_info']) for m in publish_page['publish_list'] if m.get('publish_info')]
+        return messages, publish_page.get('total_count', 0)
+
+    # 经过限速器请求后台接口：session过期时重新登录后重试，触发频率限制时降速后重试，超过重试次数则抛出
+    def request_json(self, url, params):
+        for retry in range(self.max_retries + 1):
+            self.limiter.acquire()
+            response = requests.get(url=url, params=params, headers=self.headers, timeout=DEFAULT_TIMEOUT).json()
+            try:
+                if self.session_is_overdue(response, params['token']):
+                    params['token'] = self.token
+                    continue
+            except FreqControlError:
+                self.limiter.on_throttle()
+                if retry == self.max_retries:
+                    raise
+                continue
+            self.limiter.on_success()
+            return response
+        raise Exception('The session is still overdue after login')
+
+    # 将一次发布中的文章转换为message_info中的格式
+    @staticmethod
+    def parse_message(message):
+        blogs = []
+        for appmsg in message['appmsgex']:
+            if not appmsg['create_time']:
+                continue
+            blogs.append({
+                'title': appmsg['title'],
+                'create_time': jstime2realtime(appmsg['create_time']),
+                'link': appmsg['link'],
+                'id': str(message['msgid']) + '/' + str(appmsg['aid']),
+            })
+        return blogs
+
+    # 请求次数限制，不是请求文章条数限制
+    # 从最新的文章开始逐页往前翻，直到遇到已存在的msgid、翻到最早的文章或达到max_pages，请求速度由self.limiter控制
+    # 页大小自适应：先请求小页，整页都是新文章时翻倍，最大20
+    def fakeid2message_update(self, fakeid, message_exist=[], max_pages=10):
         # 根据文章id判断新爬取的文章是否已存在
         msgid_exist = set()
         for m in message_exist:
             msgid_exist.add(int(m['id'].split('/')[0]))
 
         message_url = []
-        url = "https://mp.weixin.qq.com/cgi-bin/appmsgpublish?"
-        response = requests.get(url=url, params=params, headers=headers).json()
-        if self.session_is_overdue(response):
-            params['token'] = self.token
-            response = requests.get(url=url, params=params, headers=headers).json()
-            self.session_is_overdue(response)
-        # if 'publish_page' not in response.keys():
-        #     raise Exception('The number of requests is too fast, please try again later')
-        messages = json.loads(response['publish_page'])['publish_list']
-        for message_i in range(len(messages)):
-            message = json.loads(messages[message_i]['publish_info'])
-            if message['msgid'] in msgid_exist:
-                continue
-            for i in range(len(message['appmsgex'])):
-                link = message['appmsgex'][i]['link']
-                if not message['appmsgex'][i]['create_time']:
+        # 没有历史文章时直接用最大页
+        count = self.min_page_size if msgid_exist else 20
+        begin = 0
+        for _ in range(max_pages):
+            messages, total_count = self.fetch_message_page(fakeid, begin, count)
+            reach_exist = False
+            for message in messages:
+                if message['msgid'] in msgid_exist:
+                    reach_exist = True
                     continue
-                real_time = jstime2realtime(message['appmsgex'][i]['create_time'])
-                message_url.append({
-                    'title': message['appmsgex'][i]['title'],
-                    'create_time': real_time,
-                    'link': link,
-                    'id': str(message['msgid']) + '/' + str(message['appmsgex'][i]['aid']),
-                })
+                message_url.extend(self.parse_message(message))
+            begin += len(messages)
+            if reach_exist or not messages or begin >= total_count:
+                break
+            count = min(count * 2, 20)
         message_url.sort(key=lambda x: x['create_time'])
         return message_url
 
+    # 回填历史文章，按页返回新文章的生成器，调用方处理完一页（如写入message_info）后再取下一页时，才会记录游标
+    # 游标按fakeid保存在fetch_cursor.json中，中断后再次调用从上次的位置继续
+    # 两次运行之间有新发布时偏移量会整体后移，因此从游标往前退一页开始，重叠部分按msgid跳过
+    def backfill_messages(self, fakeid, message_exist=[], max_pages=None):
+        msgid_exist = set()
+        for m in message_exist:
+            msgid_exist.add(int(m['id'].split('/')[0]))
+
+        cursor = handle_json('fetch_cursor').get(fakeid, {})
+        if cursor.get('done'):
+            return
+        begin = max(0, cursor.get('begin', 0) - 20)
+        page = 0
+        while max_pages is None or page < max_pages:
+            messages, total_count = self.fetch_message_page(fakeid, begin, 20)
+            blogs = []
+            for message in messages:
+                if message['msgid'] in msgid_exist:
+                    continue
+                msgid_exist.add(message['msgid'])
+                blogs.extend(self.parse_message(message))
+            blogs.sort(key=lambda x: x['create_time'])
+            yield blogs
+
+            begin += len(messages)
+            page += 1
+            done = not messages or begin >= total_count
+            patch_json('fetch_cursor', [('set', [fakeid], {
+                'begin': begin,
+                'total_count': total_count,
+                'done': done,
+                'update_time': time_now(),
+            })])
+            if done:
+                break
+
     def login(self):
         import re
         from DrissionPage import ChromiumPage
@@ -134,14 +212,16 @@ class WechatRequest:
         handle_json('id_info', data=id_info)
         bro.close()
 
-    # 检查session和token是否过期
-    def session_is_overdue(self, response):
+    # 检查session和token是否过期，token_used为本次请求使用的token，已被其他线程重新登录更新时不再登录
+    def session_is_overdue(self, response, token_used=None):
         err_msg = response['base_resp']['err_msg']
         if err_msg in ['invalid session', 'invalid csrf token']:
-            self.login()
+            with self.login_lock:
+                if token_used is None or token_used == self.token:
+                    self.login()
             return True
         if err_msg == 'freq control':
-            raise Exception('The number of requests is too fast, please try again later')
+            raise FreqControlError('The number of requests is too fast, please try again later')
         return False
 
     def sort_messages(self):
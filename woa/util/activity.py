@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# @Author      : Cao Zejun
+# @Time        : 2026/10/19 10:20
+# @File        : activity.py
+# @Software    : Pycharm
+# @description : 公众号发文活跃度模型，根据历史发文时间预测是否有新文章，决定本次是否请求
+'''
+每次运行都要对所有公众号请求一次 appmsgpublish，很多公众号几周才发一篇，这些请求大多是空的，还占用限频额度。
+
+这里根据 message_info 中已有文章的 create_time 为每个公众号估计：
+- 发文频率 rate：最近 window_days 天内的发文次数 / 天数（同一分钟发布的多篇文章算一次），加了平滑，长期不发文的公众号频率趋近于 0
+- 发文时间分布 hours：24 个小时各自的发文概率，加了平滑，没有记录的小时也有少量概率
+上次爬取到现在之间预计的发文次数 = 逐小时累加 rate * hours[该小时]，超过 threshold 才请求。
+为了不漏掉突然活跃的公众号，距离上次爬取超过 max_interval_days 天时无论预测结果如何都会请求。
+'''
+import datetime
+
+TIME_FORMAT = '%Y-%m-%d %H:%M'
+
+
+def activity_profile(blogs, now, window_days=90, alpha=0.5):
+    '''
+    :param blogs: message_info 中某个公众号的 blogs 列表
+    :param now: 当前时间，datetime
+    :param window_days: 统计发文频率的时间窗口（天）
+    :param alpha: 平滑系数
+    :return: {'rate': 每天发文次数, 'hours': 24 个小时的发文概率}
+    '''
+    publish_times = {m['create_time'] for m in blogs if m.get('create_time')}
+    start = now - datetime.timedelta(days=window_days)
+    hour_count = [alpha] * 24
+    recent = 0
+    first = None
+    for t in publish_times:
+        t = datetime.datetime.strptime(t, TIME_FORMAT)
+        hour_count[t.hour] += 1
+        if t >= start:
+            recent += 1
+        first = t if first is None else min(first, t)
+
+    # 新公众号按实际存在的天数计算，至少 7 天，避免只有一两篇时频率偏高
+    days = window_days
+    if first is not None and first > start:
+        days = max(7, (now - first).total_seconds() / 86400)
+    total = sum(hour_count)
+    return {
+        'rate': (recent + alpha) / (days + 1),
+        'hours': [c / total for c in hour_count],
+    }
+
+
+def expected_posts(profile, since, until):
+    '''since 到 until 之间预计的发文次数，按小时累加'''
+    expected = 0.0
+    t = since
+    while t < until:
+        step = min(until, (t + datetime.timedelta(hours=1)).replace(minute=0, second=0, microsecond=0))
+        expected += profile['rate'] * profile['hours'][t.hour] * (step - t).total_seconds() / 3600
+        t = step
+    return expected
+
+
+def should_poll(blogs, last_crawl, now=None, threshold=0.5, max_interval_days=14):
+    '''
+    判断本次是否需要请求该公众号
+    :param blogs: message_info 中该公众号的 blogs 列表
+    :param last_crawl: 上次爬取时间，message_info 中的 latest_time 字符串
+    :param threshold: 预计发文次数超过该值时请求
+    :param max_interval_days: 最长请求间隔（天）
+    :return: (是否请求, 预计发文次数)
+    '''
+    now = now or datetime.datetime.now()
+    if not last_crawl or not blogs:
+        return True, float('inf')
+    since = datetime.datetime.strptime(last_crawl, TIME_FORMAT)
+    if (now - since).days >= max_interval_days:
+        return True, float('inf')
+    expected = expected_posts(activity_profile(blogs, now), since, now)
+    return expected >= threshold, expected
@@ -17,56 +17,84 @@
 
 - datasketch官方文档：https://ekzhu.com/datasketch/lsh.html
 '''
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+import bisect
 import re
 import pickle
 import sys
-from collections import defaultdict
 import requests
 from lxml import etree
 from tqdm import tqdm
 from upstash_vector import Index
-from nltk.translate.bleu_score import corpus_bleu, sentence_bleu
 
 # 调试用，执行当前文件时防止路径导入错误
 if sys.argv[0] == __file__:
-    from util import headers, message_is_delete, handle_json
+    from util import headers, message_is_delete, handle_json, patch_json
+    from lsh_index import WindowedLSH
+    from minhash_batch import BatchMinHash, jaccard
+    from fetcher import session, DEFAULT_TIMEOUT, HostRateLimiter, fetch_concurrently
+    from text_store import TextStore
+    from valid_index import ValidIndex
+    from message_reader import iter_messages
+    from similarity import char_bleu
+    from tokenizer import iter_tokens, split_text
 else:
-    from .util import headers, message_is_delete, handle_json
+    from .util import headers, message_is_delete, handle_json, patch_json
+    from .lsh_index import WindowedLSH
+    from .minhash_batch import BatchMinHash, jaccard
+    from .fetcher import session, DEFAULT_TIMEOUT, HostRateLimiter, fetch_concurrently
+    from .text_store import TextStore
+    from .valid_index import ValidIndex
+    from .message_reader import iter_messages
+    from .similarity import char_bleu
+    from .tokenizer import iter_tokens, split_text
 
+data_path = Path(__file__).parent.parent / 'data'
 
-def url2text(url, num=0):
+
+def url2text(url, num=0, limiter=None):
     '''
     提取文本方法1：直接获取对应div下的所有文本，未处理
     :param url:
+    :param limiter: 按域名限速的 HostRateLimiter，并发请求时传入
     :return: 列表形式，每个元素对应 div 下的一个子标签内的文本
     '''
-    response = requests.get(url, headers=headers).text
-    tree = etree.HTML(response)
-    # 不同文章存储字段的class标签名不同
-    div = tree.xpath('//div[@class="rich_media_content js_underline_content\n                       autoTypeSetting24psection\n            "]')
-    if not div:
-        div = tree.xpath('//div[@class="rich_media_content js_underline_content\n                       defaultNoSetting\n            "]')
-    # 点进去显示分享一篇文章，然后需要再点阅读原文跳转
-    if not div:
-        data_url = tree.xpath('//div[@class="original_panel_tool"]/span/@data-url')
-        if data_url:
-            response = requests.get(data_url[0], headers=headers).text
-            tree = etree.HTML(response)
-            # 不同文章存储字段的class标签名不同
-            div = tree.xpath('//div[@class="rich_media_content js_underline_content\n                       autoTypeSetting24psection\n            "]')
-            if not div:
-                div = tree.xpath('//div[@class="rich_media_content js_underline_content\n                       defaultNoSetting\n            "]')
+    def get(u):
+        if limiter:
+            limiter.wait(u)
+        return session.get(u, headers=headers, timeout=DEFAULT_TIMEOUT).text
+
+    try:
+        response = get(url)
+        tree = etree.HTML(response)
+        # 不同文章存储字段的class标签名不同
+        div = tree.xpath('//div[@class="rich_media_content js_underline_content\n                       autoTypeSetting24psection\n            "]')
+        if not div:
+            div = tree.xpath('//div[@class="rich_media_content js_underline_content\n                       defaultNoSetting\n            "]')
+        # 点进去显示分享一篇文章，然后需要再点阅读原文跳转
+        if not div:
+            data_url = tree.xpath('//div[@class="original_panel_tool"]/span/@data-url')
+            if data_url:
+                response = get(data_url[0])
+                tree = etree.HTML(response)
+                # 不同文章存储字段的class标签名不同
+                div = tree.xpath('//div[@class="rich_media_content js_underline_content\n                       autoTypeSetting24psection\n            "]')
+                if not div:
+                    div = tree.xpath('//div[@class="rich_media_content js_underline_content\n                       defaultNoSetting\n            "]')
+    except requests.RequestException:
+        # 超时或连接错误，按请求错误处理
+        response, div = None, []
 
     # 判断是博文删除了还是请求错误
     if not div:
-        if message_is_delete(response=response):
+        if response and message_is_delete(response=response):
             return '已删除'
         else:
             # '请求错误'则再次重新请求，最多3次
             if num == 3:
                 return '请求错误'
-            return url2text(url, num=num+1)
+            return url2text(url, num=num+1, limiter=limiter)
 
     s_p = [p for p in div[0].iter() if p.tag in ['section', 'p']]
     text_list = []
@@ -109,20 +137,33 @@ def calc_duplicate_rate1(text_list1, text_list2):
 def calc_duplicate_rate_max(text_list1, text_list2):
     # 重复字数判断，调换顺序计算两次
     dup_rate = max([calc_duplicate_rate1(text_list1, text_list2), calc_duplicate_rate1(text_list2, text_list1)])
-    # 再次计算bleu值
+    # 再次计算bleu值，char_bleu 与 nltk 的 sentence_bleu([list(text1)], list(text2)) 结果一致
     if dup_rate < 0.8:
-        dup_rate = max(dup_rate, sentence_bleu([list(''.join(text_list1))], list(''.join(text_list2))))
+        dup_rate = max(dup_rate, char_bleu(''.join(text_list1), ''.join(text_list2)))
     return dup_rate
 
 def get_filtered_message():
-    generate_title_head()
+    # title_head 不存在时全量生成一次，之后由 update_title_head 增量维护
     title_head = handle_json('title_head')
+    if not title_head:
+        generate_title_head()
+        title_head = handle_json('title_head')
+    title_head_dirty = handle_json('title_head_dirty')
     delete_messages = handle_json('delete_message')
+    delete_messages.setdefault('is_delete', [])
+    delete_messages_set = set(delete_messages['is_delete'])
     duplicate_message = handle_json('dup_message')
 
+    # 只处理上次运行之后有新文章加入的标题
     error_links = []
-    for k, v in tqdm(title_head.items(), total=len(title_head)):
-        if v['co_count'] == 1:
+    for k in tqdm(title_head_dirty.get('titles', []), total=len(title_head_dirty.get('titles', []))):
+        if k not in title_head:
+            continue
+        v = title_head[k]
+        # 去掉之前已确认删除的文章，不再重复请求
+        v['links'] = [l for l in v['links'] if l['id'] not in delete_messages_set]
+        v['co_count'] = len(v['links'])
+        if v['co_count'] <= 1:
             continue
 
         # 从列表中找到一个没被删除的
@@ -157,38 +198,62 @@ def get_filtered_message():
         print(e)
     print(f'共有{len(error_links)}个链接读取失败')
     handle_json('title_head', data=title_head)
+    handle_json('title_head_dirty', data={'titles': []})
     handle_json('dup_message', data=duplicate_message)
     handle_json('delete_message', data=delete_messages)
 
-# 以message_info文件生成title_head文件
+# 以message_info文件全量生成title_head文件
 def generate_title_head():
-    message_info = handle_json('message_info')
     delete_messages = handle_json('delete_message')
-    delete_messages_set = set(delete_messages['is_delete'])
+    delete_messages_set = set(delete_messages.get('is_delete', []))
 
     # 以 title 为 key 写入 json 文件，记录有几个重复的title和它们的相关信息
-    title_head = defaultdict(dict)
-    for k, v in message_info.items():
-        for m in v['blogs']:
-            if m['id'] in delete_messages_set:
-                continue
-            title = m['title']
-            if title not in title_head.keys():
-                title_head[title] = {
-                    'co_count': 1,
-                    'links': [],
-                }
-            cur_m = {
-                'id': m['id'],
-                'link': m['link'],
-                'create_time': m['create_time'],
-            }
-            title_head[title]['links'].append(cur_m)
+    # 流式读取message_info，不需要把整个文件读入内存
+    title_head = {}
+    for _, m in iter_messages():
+        if m['id'] in delete_messages_set:
+            continue
+        cur_m = {
+            'id': m['id'],
+            'link': m['link'],
+            'create_time': m['create_time'],
+        }
+        title_head.setdefault(m['title'], {'co_count': 1, 'links': []})['links'].append(cur_m)
 
     for k, v in title_head.items():
         v['links'].sort(key=lambda x: x['create_time'])
-        title_head[k]['co_count'] = len(v['links'])
+        v['co_count'] = len(v['links'])
+    handle_json('title_head', data=title_head)
+    # 全量生成后所有重复标题都需要重新处理
+    handle_json('title_head_dirty', data={'titles': [k for k, v in title_head.items() if v['co_count'] > 1]})
+
+# 增量更新title_head文件，new_messages为fakeid2message_update新增的文章
+def update_title_head(new_messages):
+    title_head = handle_json('title_head')
+    # 还没有生成过title_head时直接全量生成，此时新文章已经在message_info中
+    if not title_head:
+        generate_title_head()
+        return
+    title_head_dirty = handle_json('title_head_dirty')
+    dirty = set(title_head_dirty.get('titles', []))
+
+    for m in new_messages:
+        group = title_head.setdefault(m['title'], {'co_count': 0, 'links': []})
+        links = group['links']
+        if any(l['id'] == m['id'] for l in links):
+            continue
+        cur_m = {
+            'id': m['id'],
+            'link': m['link'],
+            'create_time': m['create_time'],
+        }
+        # 按create_time有序插入，保持组内最早发布的文章在最前面
+        links.insert(bisect.bisect_right([l['create_time'] for l in links], m['create_time']), cur_m)
+        group['co_count'] = len(links)
+        dirty.add(m['title'])
+
     handle_json('title_head', data=title_head)
+    handle_json('title_head_dirty', data={'titles': sorted(dirty)})
 
 # 暂时弃用
 class UpstashVector:
@@ -280,115 +345,226 @@ class UpstashVector:
         # 返回 True 表示异常已被处理，不会向外传播
         return True
 
+# 未设置时间窗口时，只对该日期之后的文章去重
+DEFAULT_SINCE = '2024-07-01'
+
+
 class minHashLSH:
-    def __init__(self):
-        from datasketch import MinHash, MinHashLSH
-        self.lsh = MinHashLSH(threshold=0.8, num_perm=128)
+    def __init__(self, window_days=None, data_dir=data_path, threshold=0.8):
+        '''
+        :param window_days: 去重时间窗口（天），只和最近 window_days 天内的文章比较，更早的文章移入冷索引，
+                            None 时与原来一样比较 DEFAULT_SINCE 之后的全部文章
+        :param data_dir: message_info、issues_message、正文存储和索引所在的目录，benchmark 用临时目录
+        :param threshold: LSH 阈值，修改后需要删除已有的索引重新建立
+        '''
+        data_dir = Path(data_dir)
+        self.message_info_path = data_dir / 'message_info.json'
+        self.issues_message_path = data_dir / 'issues_message.json'
+        # 持久化的LSH索引，历史文章只需插入一次，之后每次运行加载已有的分桶结果，不需要重新计算签名
+        self.lsh = WindowedLSH(data_dir / 'lsh_index', window_days=window_days, threshold=threshold, num_perm=128)
+        # 批量计算minhash签名，结果与datasketch.MinHash逐个update一致
+        self.minhash = BatchMinHash(num_perm=128)
+        # 并发获取正文的线程数和每秒请求数
+        self.fetch_workers = 8
+        self.fetch_rate = 5
+        # 规则复核时候选文章正文的读取统计：本地命中次数、网络请求次数，以及本次运行已重新请求过的id
+        self.text_hit = 0
+        self.text_fetched = 0
+        self.refetched = set()
+        # 爬取过程中边到达边预取的正文请求和提前算好的签名，write_vector时直接使用
+        self.prefetch_executor = None
+        self.prefetch_limiter = HostRateLimiter(rate=self.fetch_rate)
+        self.prefetch_futures = []
+        self.pending_signatures = {}
 
         # 加载minhash重复文件
-        self.issues_message = handle_json('issues_message')
+        self.issues_message = handle_json(self.issues_message_path)
         if 'dup_minhash' not in self.issues_message.keys():
             self.issues_message['dup_minhash'] = {}
+        # 本次运行新增的重复记录，退出时以补丁形式追加到issues_message.json，不重写整个文件
+        self.issues_patches = []
 
         self.delete_messages_set = set(self.issues_message['is_delete'])
-        self.message_detail_text = handle_json('message_detail_text')
+        # 文章正文存储，按id读取，不再一次性加载整个json
+        self.message_detail_text = TextStore(data_dir / 'message_detail_text.db', data_dir / 'message_detail_text.json')
+        # 有效文章索引，删除和重复的判断结果同步写入，生成md时直接读取
+        self.valid_index = ValidIndex(data_dir / 'valid_message.db')
 
         # 加载minhash签名缓存文件
-        self.minhash_dict_path = Path(__file__).parent.parent / 'data' / 'minhash_dict.pickle'
-        # minhash_dict 字典记录所有id的minhash签名，key: id, value: minhash签名
+        self.minhash_dict_path = data_dir / 'minhash_dict.pickle'
+        # minhash_dict 字典记录时间窗口内所有id的minhash签名，key: id, value: minhash签名的hash值(uint64数组)
+        # 窗口外的签名随文章一起移入冷索引，不再常驻内存
         if self.minhash_dict_path.exists():
             with open(self.minhash_dict_path, 'rb') as fp:
-                self.minhash_dict = pickle.load(fp)  # 此时v是minhash签名的hash值(数组)
-            for k, v in self.minhash_dict.items():
-                self.minhash_dict[k] = MinHash(hashvalues=v)  # 将其转换为MinHash对象
+                self.minhash_dict = pickle.load(fp)
         else:
             self.minhash_dict = {}
 
+        # 首次启用持久化索引时，用已有的minhash签名建立索引，不需要重新请求和编码
+        if not len(self.lsh) and not len(self.lsh.archive) and self.minhash_dict:
+            self.lsh.insert_many((k, v) for k, v in self.minhash_dict.items()
+                                 if k not in self.issues_message['dup_minhash']
+                                 and k not in self.delete_messages_set)
+            self.lsh.flush()
+
+    def prefetch(self, messages):
+        '''
+        爬取文章列表时新文章一到达就调用，在后台线程中请求正文并计算minhash签名，不阻塞调用方
+        write_vector开始时等待所有预取完成，已有签名的文章不再重复计算
+        '''
+        if self.prefetch_executor is None:
+            self.prefetch_executor = ThreadPoolExecutor(max_workers=self.fetch_workers)
+        for m in messages:
+            if self.is_signed(m['id']) or m['id'] in self.delete_messages_set:
+                continue
+            self.prefetch_futures.append(self.prefetch_executor.submit(self._prefetch_one, m))
+
+    def _prefetch_one(self, m):
+        text_list = self.message_detail_text.get(m['id'])
+        if text_list is None:
+            text_list = url2text(m['link'], limiter=self.prefetch_limiter)
+            self.message_detail_text[m['id']] = text_list
+        if text_list not in ['已删除']:
+            self.pending_signatures[m['id']] = self.minhash.signature(iter_tokens(' '.join(text_list)))
+
+    def wait_prefetch(self):
+        for future in self.prefetch_futures:
+            # 预取失败的文章在write_vector中按原流程重新请求
+            if future.exception():
+                print(f'预取正文失败: {future.exception()}')
+        self.prefetch_futures = []
+        if self.prefetch_executor is not None:
+            self.prefetch_executor.shutdown()
+            self.prefetch_executor = None
+
+    def is_signed(self, id_):
+        # 已经编码（也已去过重）的文章，签名在内存中或已移入冷索引
+        return id_ in self.minhash_dict or id_ in self.lsh.archive
+
+    def evict(self, id2time):
+        '''把时间窗口之外的文章移入冷索引，并释放它们在内存中的签名'''
+        expired = self.lsh.evict(id2time, self.minhash_dict)
+        cutoff = self.lsh.cutoff()
+        # 重复的文章不在LSH中，签名直接释放
+        for k in [k for k in self.minhash_dict if k in expired or id2time.get(k, '') < cutoff]:
+            del self.minhash_dict[k]
+        if expired:
+            print(f'{len(expired)} messages moved to archive, {len(self.lsh)} left in live index')
+
     def write_vector(self):
-        from datasketch import MinHash
-        message_info = handle_json('message_info')
-        id2url = {m['id']: m['link'] for v in message_info.values() for m in v['blogs']}
+        self.wait_prefetch()
+        # 流式读取message_info，只保留用到的字段，不把整个文件读入内存
+        id2url = {}
+        id2time = {}
+        for _, m in iter_messages(self.message_info_path, fields=('id', 'link', 'create_time')):
+            id2url[m['id']] = m['link']
+            id2time[m['id']] = m['create_time']
+        # 窗口外的文章先移出在线索引，之后的查询只在窗口内进行
+        since = self.lsh.cutoff()
+        if since is None:
+            since = DEFAULT_SINCE
+        else:
+            self.evict(id2time)
 
-        message_total = [m for v in message_info.values() for m in v['blogs']
+        # 1. 找出没有minhash编码的文章（已 minhash 编码的文章也已去过重），并发获取缺失的文本后批量编码
+        message_total = [m for _, m in iter_messages(self.message_info_path, since=since,
+                                                     fields=('id', 'link', 'create_time'))
                          if m['id'] not in self.delete_messages_set
-                         and m['create_time'] > "2024-07-01"]
+                         and not self.is_signed(m['id'])]
         message_total.sort(key=lambda x: x['create_time'])
-        for i, m in tqdm(enumerate(message_total), total=len(message_total)):
-            # 如果文章没有minhash编码，则进行minhash编码
-            if m['id'] not in self.minhash_dict.keys():
-                if m['id'] not in self.message_detail_text:
-                    self.message_detail_text[m['id']] = url2text(m['link'])
-                text_list = self.message_detail_text[m['id']]
-                if self.is_delete(text_list, m['id']): continue
-                text_list = ' '.join(text_list)
-                text_list = self.split_text(text_list)
-                min1 = MinHash(num_perm=128)
-                for d in text_list:
-                    min1.update(d.encode('utf8'))
-                self.minhash_dict[m['id']] = min1
-            else:
-                # 已 minhash 编码的文章也已去过重
-                continue
-
-            sim_m = self.lsh.query(self.minhash_dict[m['id']])
+        missing = [m for m in message_total if m['id'] not in self.message_detail_text]
+        limiter = HostRateLimiter(rate=self.fetch_rate)
+        for m, text_list in tqdm(fetch_concurrently(lambda m: url2text(m['link'], limiter=limiter), missing,
+                                                    workers=self.fetch_workers),
+                                 desc='fetching text', total=len(missing)):
+            self.message_detail_text[m['id']] = text_list
+
+        new_messages = []
+        for m in message_total:
+            if self.is_delete(self.message_detail_text[m['id']], m['id']): continue
+            new_messages.append(m)
+
+        # 分词结果以生成器的形式直接交给签名计算，不生成中间列表，预取时已算好的签名直接使用
+        to_sign = [m for m in new_messages if m['id'] not in self.pending_signatures]
+        for m, sig in zip(to_sign, self.minhash.signatures(iter_tokens(' '.join(self.message_detail_text[m['id']]))
+                                                           for m in to_sign)):
+            self.pending_signatures[m['id']] = sig
+        signatures = [self.pending_signatures.pop(m['id']) for m in new_messages]
+
+        # 2. 按发布时间顺序逐篇查询和插入，先发布的文章优先保留
+        for m, sig in tqdm(zip(new_messages, signatures), desc='minhash dedup', total=len(new_messages)):
+            self.minhash_dict[m['id']] = sig
+            sim_m = self.lsh.query(sig)
             if sim_m:
                 if m['id'] in self.issues_message['dup_minhash'].keys():
                     continue
-                # 如果有相似的，先判断jaccard相似度，大于0.9直接通过，若在0.8-0.9之间则使用规则再次判断
-                sim_m_res = []
-                for s in sim_m:
-                    if self.minhash_dict[m['id']].jaccard(self.minhash_dict[s]) >= 0.9:  # .jaccard会和MinHashLSH计算的有点差异
-                        sim_m_res.append(s)
-                    else:
-                        dup_rate = calc_duplicate_rate_max(text_list, url2text(id2url[s]))
-                        # 规则大于0.7则认为是重复的
-                        if dup_rate > 0.7:
-                            sim_m_res.append(s)
-                if sim_m_res:
-                    self.issues_message['dup_minhash'][m['id']] = {
-                        'from_id': sim_m,
-                    }
+                candidates = [(s, jaccard(sig, self.minhash_dict[s])) for s in sim_m]
             else:
-                self.lsh.insert(m['id'], self.minhash_dict[m['id']])
-        handle_json('message_detail_text', data=self.message_detail_text)
+                # 在线索引中没有相似文章时再查冷索引，窗口之外的旧文章被再次转载时同样能发现
+                candidates = self.lsh.query_archive(sig)
+                sim_m = [s for s, _ in candidates]
+            sim_m_res = self.confirm_dup(m['id'], candidates, id2url)
+            if sim_m_res:
+                self.issues_message['dup_minhash'][m['id']] = {
+                    'from_id': sim_m,
+                }
+                self.issues_patches.append(('set', ['dup_minhash', m['id']], self.issues_message['dup_minhash'][m['id']]))
+                self.valid_index.mark_dup([m['id']])
+            elif not sim_m:
+                self.lsh.insert(m['id'], sig)
+        self.message_detail_text.commit()
+        print(f'{self.text_hit} candidate texts read from local store, {self.text_fetched} fetched from network')
+
+    def confirm_dup(self, id_, candidates, id2url):
+        '''
+        复核LSH找到的候选文章：jaccard大于0.9直接认为重复，否则用规则再次判断
+        :param candidates: [(候选文章id, jaccard), ...]
+        :return: 确认重复的候选文章id列表
+        '''
+        sim_m_res = []
+        text_list = None
+        for s, sim in candidates:
+            if sim >= 0.9:  # jaccard会和LSH分桶的结果有点差异
+                sim_m_res.append(s)
+                continue
+            # 已从message_info中移除、本地也没有正文的历史文章无法复核
+            if s not in id2url and s not in self.message_detail_text:
+                continue
+            if text_list is None:
+                text_list = self.split_text(' '.join(self.message_detail_text[id_]))
+            dup_rate = calc_duplicate_rate_max(text_list, self.candidate_text(s, id2url.get(s)))
+            # 规则大于0.7则认为是重复的
+            if dup_rate > 0.7:
+                sim_m_res.append(s)
+        return sim_m_res
+
+    def candidate_text(self, id_, url):
+        '''
+        规则复核时获取候选文章的正文：优先读本地正文存储，只有缺失或上次请求失败时才重新请求，
+        请求结果写回存储，本次运行内同一篇文章最多请求一次
+        '''
+        text_list = self.message_detail_text.get(id_)
+        # url为None时（文章已从message_info中移除）只能使用本地正文
+        if text_list is not None and (text_list != '请求错误' or id_ in self.refetched or url is None):
+            self.text_hit += 1
+            return text_list
+        text_list = url2text(url)
+        self.message_detail_text[id_] = text_list
+        self.refetched.add(id_)
+        self.text_fetched += 1
+        return text_list
 
     def is_delete(self, text_list, id_):
         if text_list in ['已删除']:
             self.issues_message['is_delete'].append(id_)
-            handle_json('issues_message', data=self.issues_message)
+            patch_json(self.issues_message_path, [('append', ['is_delete'], id_)])
+            self.valid_index.mark_deleted([id_])
             return True
         return False
 
     def split_text(self, text):
-        # words = re.findall(r'\w| |[\u4e00-\u9fff]', text)
-        words = list(text)
-
-        # 结果列表
-        result = []
-        last_word = 0  # 0：中文，1：英文
-
-        for word in words:
-            if '\u4e00' <= word <= '\u9fff':  # 如果是中文字符
-                result.append(word)
-                last_word = 0
-            else:  # 如果是英文单词
-                if not result:
-                    if word != ' ':
-                        result.append(word)
-                        last_word = 1
-                else:
-                    if last_word == 1:
-                        if word != ' ':
-                            result[-1] += word
-                            last_word = 1
-                        else:
-                            last_word = 0
-                    else:
-                        if word != ' ':
-                            result.append(word)
-                            last_word = 1
-
-        return result
+        # 单个汉字为一个词，连续的非汉字、非空格字符为一个词
+        return split_text(text)
 
     # 为了正确调用with
     def __enter__(self):
@@ -396,12 +572,14 @@ class minHashLSH:
 
     # 在debug停止或发生异常时能及时保存
     def __exit__(self, exc_type, exc_val, exc_tb):
-        hashvalues_dict = {}
-        for k, v in self.minhash_dict.items():
-            hashvalues_dict[k] = v.hashvalues
+        self.wait_prefetch()
         with open(self.minhash_dict_path, 'wb') as fp:
-            pickle.dump(hashvalues_dict, fp)
-        handle_json('issues_message', data=self.issues_message)
+            pickle.dump(self.minhash_dict, fp)
+        self.lsh.flush()
+        self.message_detail_text.close()
+        self.valid_index.close()
+        patch_json(self.issues_message_path, self.issues_patches)
+        self.issues_patches = []
         # 返回 True 表示异常已被处理，不会向外传播
         # return True
 
@@ -0,0 +1,330 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# @Author      : Cao Zejun
+# @Time        : 2026/10/18 15:10
+# @File        : json_store.py
+# @Software    : Pycharm
+# @description : json 文件的原子写入和增量补丁，handle_json 的底层实现
+'''
+原来的 handle_json 每次都把整个对象以 indent=4 写到当前目录下共用的 tmp.json，再 shutil.move 过去：
+- 两个进程同时写不同的文件会互相覆盖 tmp.json
+- 没有 fsync，断电时 move 过去的可能是空文件
+- issues_message、message_info 每次小改动都要重写几 MB
+
+这里的做法：
+- 全量写入：在目标文件同目录下生成独立的临时文件，写完 fsync 后 os.replace，保证目标文件要么是旧内容要么是新内容
+- compact=True 时不缩进、紧凑分隔符，体积约为缩进格式的一半
+- 增量补丁：小改动以 jsonl 追加到 <文件名>.patch.jsonl，读取时按顺序应用到主文件上；
+  补丁超过 max_patch_bytes 或调用 compact_json 时合并回主文件并删除补丁
+- 同一个文件的写入用 <文件名>.lock 锁文件互斥，多进程安全
+- 全量写入前检查"读取之后"文件的变化：读取之后其他进程追加的补丁保留在补丁文件中，之后读取时应用到新内容上；
+  读取之后主文件被其他进程重写（全量写入或合并补丁），或者没有读取过就要覆盖有补丁的文件时，拒绝写入，
+  避免用旧数据覆盖别人的修改。本进程读取之后自己追加过补丁时同样拒绝全量写入：
+  无法判断内存中的数据是否已经包含这些补丁，直接写入可能丢掉它们，需要重新读取
+
+补丁格式为 {"op": 操作, "path": [键, ...], "value": 值}，操作有：
+- set：path 处赋值（path 为空时替换整个对象）
+- del：删除 path 处的键
+- append：path 处的列表追加一个元素
+- extend：path 处的列表追加多个元素
+'''
+from pathlib import Path
+import json
+import os
+import tempfile
+import time
+
+# 补丁文件超过该大小时自动合并回主文件
+MAX_PATCH_BYTES = 4 * 1024 * 1024
+
+# 本进程最近一次读取每个文件时的状态：{路径: (主文件的 (mtime_ns, size), 已读取的补丁字节数, 读取之后本进程是否追加过补丁)}
+_seen = {}
+
+
+class ConcurrentModificationError(RuntimeError):
+    pass
+
+
+class FileLock:
+    '''
+    基于 O_EXCL 创建锁文件的进程间互斥锁，windows 和 linux 通用
+    持有者异常退出留下的锁文件超过 stale 秒视为失效，自动清除
+    '''
+    def __init__(self, path, timeout=30, stale=120):
+        self.path = Path(path)
+        self.timeout = timeout
+        self.stale = stale
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.write(fd, str(os.getpid()).encode())
+                os.close(fd)
+                return
+            except FileExistsError:
+                try:
+                    if time.time() - self.path.stat().st_mtime > self.stale:
+                        self.path.unlink()
+                        continue
+                except FileNotFoundError:
+                    continue
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f'获取锁超时: {self.path}')
+                time.sleep(0.05)
+
+    def release(self):
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+
+def patch_path(path):
+    path = Path(path)
+    return path.with_name(path.name + '.patch.jsonl')
+
+
+def lock_path(path):
+    path = Path(path)
+    return path.with_name(path.name + '.lock')
+
+
+def _fsync_dir(directory):
+    # windows 不支持打开目录，rename 本身已经足够
+    if os.name != 'posix':
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _dump(data, f, compact):
+    if compact:
+        json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+    else:
+        json.dump(data, f, ensure_ascii=False, indent=4)
+
+
+def _write_atomic(path, data, compact=False):
+    path = Path(path)
+    fd, tmp = tempfile.mkstemp(prefix=f'.{path.name}.', suffix='.tmp', dir=path.parent)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            _dump(data, f, compact)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    _fsync_dir(path.parent)
+
+
+def apply_patch(data, patch):
+    op, keys = patch['op'], patch['path']
+    if not keys:
+        if op == 'set':
+            return patch['value']
+        raise ValueError(f'补丁操作 {op} 需要非空 path')
+    parent = data
+    for k in keys[:-1]:
+        parent = parent.setdefault(k, {}) if isinstance(parent, dict) else parent[k]
+    k = keys[-1]
+    if op == 'set':
+        parent[k] = patch['value']
+    elif op == 'del':
+        if isinstance(parent, dict):
+            parent.pop(k, None)
+        else:
+            del parent[k]
+    elif op in ('append', 'extend'):
+        target = parent.setdefault(k, []) if isinstance(parent, dict) else parent[k]
+        if op == 'append':
+            target.append(patch['value'])
+        else:
+            target.extend(patch['value'])
+    else:
+        raise ValueError(f'未知的补丁操作: {op}')
+    return data
+
+
+def _ends_with_newline(p):
+    with open(p, 'rb') as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b'\n'
+
+
+def _read_patch_bytes(path):
+    p = patch_path(path)
+    if not p.exists():
+        return b''
+    with open(p, 'rb') as f:
+        return f.read()
+
+
+def _parse_patches(raw):
+    patches = []
+    for line in raw.decode('utf-8').splitlines():
+        try:
+            patches.append(json.loads(line))
+        except json.JSONDecodeError:
+            # 追加过程中被中断留下的不完整行，跳过
+            continue
+    return patches
+
+
+def read_patches(path):
+    return _parse_patches(_read_patch_bytes(path))
+
+
+def _stat(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def _key(path):
+    return str(Path(path).resolve())
+
+
+def read_json(path):
+    '''读取 json 文件并应用补丁，文件不存在时返回 {}'''
+    path = Path(path)
+    data = {}
+    stat = _stat(path)
+    if path.exists():
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    raw = _read_patch_bytes(path)
+    for patch in _parse_patches(raw):
+        data = apply_patch(data, patch)
+    _seen[_key(path)] = (stat, len(raw), False)
+    return data
+
+
+def write_json(path, data, compact=False):
+    '''
+    全量原子写入，读取时已有的补丁已经包含在 data 中，写入后删除；
+    读取之后其他进程追加的补丁保留，之后读取时应用到 data 上
+    :raise ConcurrentModificationError: 读取之后主文件被其他进程重写，读取之后本进程追加过补丁，
+        或者有补丁但本进程没有读取过该文件
+    '''
+    path = Path(path)
+    key = _key(path)
+    with FileLock(lock_path(path)):
+        raw = _read_patch_bytes(path)
+        seen = _seen.get(key)
+        if seen is None:
+            if raw:
+                raise ConcurrentModificationError(f'{path} 有未合并的补丁，需要先读取再全量写入')
+            offset = 0
+        else:
+            stat, offset, own_patched = seen
+            if own_patched:
+                raise ConcurrentModificationError(f'{path} 在读取之后追加过补丁，请重新读取后再全量写入')
+            if stat != _stat(path) or offset > len(raw):
+                raise ConcurrentModificationError(f'{path} 在读取之后被其他进程重写，请重新读取后再写入')
+        _write_atomic(path, data, compact)
+        tail = raw[offset:]
+        if tail:
+            _write_bytes_atomic(patch_path(path), tail)
+        else:
+            patch_path(path).unlink(missing_ok=True)
+        # 保留的补丁不在 data 中，下次全量写入时仍然保留
+        _seen[key] = (_stat(path), 0, False)
+
+
+def _write_bytes_atomic(path, raw):
+    fd, tmp = tempfile.mkstemp(prefix=f'.{path.name}.', suffix='.tmp', dir=path.parent)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(raw)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def append_patch(path, patches, compact=False, max_patch_bytes=MAX_PATCH_BYTES):
+    '''
+    以补丁形式追加小改动，不重写主文件
+    :param path: json 文件路径
+    :param patches: 补丁列表，元素为 dict 或 (op, path[, value]) 元组
+    :param compact: 自动合并时主文件是否使用紧凑格式
+    :param max_patch_bytes: 补丁文件超过该大小时自动合并
+    '''
+    path = Path(path)
+    lines = []
+    for patch in patches:
+        if not isinstance(patch, dict):
+            patch = dict(zip(('op', 'path', 'value'), patch))
+        patch = {**patch, 'path': list(patch['path'])}
+        lines.append(json.dumps(patch, ensure_ascii=False, separators=(',', ':')) + '\n')
+    if not lines:
+        return
+
+    p = patch_path(path)
+    key = _key(path)
+    with FileLock(lock_path(path)):
+        with open(p, 'ab') as f:
+            size = f.tell()
+            # 上次追加被中断时补上换行，避免新补丁和不完整的行连在一起
+            if size and not _ends_with_newline(p):
+                lines.insert(0, '\n')
+            f.write(''.join(lines).encode('utf-8'))
+            f.flush()
+            os.fsync(f.fileno())
+            new_size = f.tell()
+        # 不假设内存中的数据已经包含这些补丁，之后的全量写入需要重新读取
+        seen = _seen.get(key)
+        if seen is not None:
+            _seen[key] = (seen[0], seen[1], True)
+        if new_size > max_patch_bytes:
+            _compact(path, compact)
+
+
+def _compact(path, compact):
+    key = _key(path)
+    seen = _seen.get(key)
+    up_to_date = (seen is not None and not seen[2] and seen[0] == _stat(path)
+                  and seen[1] == patch_path(path).stat().st_size)
+    raw = _read_patch_bytes(path)
+    data = {}
+    if path.exists():
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    for patch in _parse_patches(raw):
+        data = apply_patch(data, patch)
+    _write_atomic(path, data, compact)
+    patch_path(path).unlink(missing_ok=True)
+    # 合并前本进程已读到全部补丁时，内存中的数据与合并结果一致；否则之后需要重新读取才能全量写入
+    if up_to_date:
+        _seen[key] = (_stat(path), 0, False)
+    elif seen is not None:
+        _seen[key] = (None, 0, seen[2])
+
+
+def compact_json(path, compact=False):
+    '''把补丁合并回主文件'''
+    path = Path(path)
+    if not patch_path(path).exists():
+        return
+    with FileLock(lock_path(path)):
+        _compact(path, compact)
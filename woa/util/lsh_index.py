@@ -0,0 +1,382 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# @Author      : Cao Zejun
+# @Time        : 2026/10/17 10:12
+# @File        : lsh_index.py
+# @Software    : Pycharm
+# @description : 持久化的 MinHash LSH 分桶索引，增量追加，历史文章不需要重新计算签名和插入
+'''
+datasketch.MinHashLSH 只存在于内存中，每次运行都是空索引，历史文章无法参与查询。
+这里把 LSH 的分桶结果落盘：
+- bands.bin：每篇文章一行，每个 band 一个 uint64 桶哈希，启动时用 np.memmap 映射，不读入内存
+- keys.txt：与 bands.bin 行号一一对应的文章 id，按行追加
+- meta.json：b、r、num_perm 参数，参数变化时拒绝加载，防止新旧分桶混用
+新文章只追加一行，不需要对历史文章重新计算 minhash 或重新插入。
+加载并不是 O(1) 的，耗时与文章数 N 成正比：
+- keys.txt 启动时整个读入内存，并建立 id 集合（判断文章是否已插入时使用）
+- 分桶的有序数组不落盘，每次运行首次查询时（以及 flush、remove 之后）重新排序，O(b·N·logN)
+查询时按 band 分桶查找，不扫描全部文章：
+- 已落盘的部分为每个 band 建一个有序数组（桶哈希排序后的值和对应行号），用 searchsorted 二分查找
+- 本次运行新插入的部分按 band 保存 {桶哈希: [行号]}，插入时直接加入对应的桶
+
+WindowedLSH 在此基础上按发布时间划分冷热：
+- 在线索引只保留最近 window_days 天的文章，每次去重只查询在线索引，内存和查询耗时不随历史文章增长
+- 过期的文章移到同级的 <目录名>_archive 冷索引中，同时保存完整签名，在线索引没有相似文章时用 query_archive 再查冷索引
+'''
+from collections import defaultdict
+from pathlib import Path
+import datetime
+import json
+import os
+import shutil
+
+import numpy as np
+
+# FNV-1a 64 位参数，用于把一个 band 内的 r 个哈希值压缩成一个桶哈希
+_FNV_OFFSET = np.uint64(0xcbf29ce484222325)
+_FNV_PRIME = np.uint64(0x100000001b3)
+
+
+def _optimal_param(threshold, num_perm):
+    # 与 datasketch.MinHashLSH 默认权重 (0.5, 0.5) 下的参数保持一致
+    from datasketch.lsh import _optimal_param
+    return _optimal_param(threshold, num_perm, 0.5, 0.5)
+
+
+class _GrowingArray:
+    '''按行追加的二维 uint64 数组，容量不足时翻倍扩容，避免每次追加都重新拼接'''
+    def __init__(self, cols, capacity=64):
+        self.data = np.empty((capacity, cols), dtype=np.uint64)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def extend(self, rows):
+        rows = np.asarray(rows, dtype=np.uint64).reshape(-1, self.data.shape[1])
+        need = self.size + len(rows)
+        if need > len(self.data):
+            data = np.empty((max(need, len(self.data) * 2), self.data.shape[1]), dtype=np.uint64)
+            data[:self.size] = self.data[:self.size]
+            self.data = data
+        self.data[self.size:need] = rows
+        self.size = need
+
+    def view(self):
+        return self.data[:self.size]
+
+
+def _recover_swap(path):
+    '''compact 替换目录时中断，按 .tmp（已写完的新目录）、.old（旧目录）的顺序恢复'''
+    tmp, old = path.with_name(path.name + '.tmp'), path.with_name(path.name + '.old')
+    if not path.exists():
+        if old.exists() and tmp.exists() and (tmp / 'complete').exists():
+            os.rename(tmp, path)
+        elif old.exists():
+            os.rename(old, path)
+    for p in (tmp, old):
+        if p.exists():
+            shutil.rmtree(p)
+
+
+class PersistentLSH:
+    '''
+    :param path: 索引目录
+    :param store_signatures: 是否同时保存完整签名（signatures.bin），冷索引需要用签名计算 jaccard
+    '''
+    def __init__(self, path, threshold=0.8, num_perm=128, store_signatures=False):
+        self.path = Path(path)
+        self.threshold = threshold
+        _recover_swap(self.path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.num_perm = num_perm
+        self.b, self.r = _optimal_param(threshold, num_perm)
+        self.store_signatures = store_signatures
+
+        self.meta_path = self.path / 'meta.json'
+        self.bands_path = self.path / 'bands.bin'
+        self.keys_path = self.path / 'keys.txt'
+        self.sigs_path = self.path / 'signatures.bin'
+
+        meta = {'num_perm': num_perm, 'b': self.b, 'r': self.r}
+        if self.meta_path.exists():
+            with open(self.meta_path, 'r', encoding='utf-8') as f:
+                old_meta = json.load(f)
+            if old_meta != meta:
+                raise ValueError(f'LSH索引参数不一致: {old_meta} != {meta}，请删除 {self.path} 后重建')
+        else:
+            with open(self.meta_path, 'w', encoding='utf-8') as f:
+                json.dump(meta, f)
+
+        # 已落盘的部分：id 列表 + 内存映射的桶哈希矩阵
+        self.keys = []
+        if self.keys_path.exists():
+            with open(self.keys_path, 'r', encoding='utf-8') as f:
+                # 最后一段没有换行符说明写入被中断，丢弃
+                self.keys = f.read().split('\n')[:-1]
+        row_bytes = self.b * np.dtype(np.uint64).itemsize
+        sig_bytes = self.num_perm * np.dtype(np.uint64).itemsize
+        rows = self.bands_path.stat().st_size // row_bytes if self.bands_path.exists() else 0
+        # 写入中途中断时几个文件行数可能不一致，以较短的为准
+        rows = min(rows, len(self.keys))
+        if store_signatures:
+            rows = min(rows, self.sigs_path.stat().st_size // sig_bytes if self.sigs_path.exists() else 0)
+        self.keys = self.keys[:rows]
+        self._repair(rows, row_bytes, sig_bytes)
+        self.bands = self._map(self.bands_path, rows, self.b)
+        self.sigs = self._map(self.sigs_path, rows, self.num_perm) if store_signatures else None
+        self.key_set = set(self.keys)
+        self._key_index = None
+        # 已落盘部分的分桶索引，首次查询时建立：每个 band 一行，排序后的桶哈希和对应的行号
+        self._sorted_bands = None
+        self._sorted_rows = None
+
+        # 本次运行新插入、尚未落盘的部分
+        self._reset_new()
+
+    def _reset_new(self):
+        self._new_keys = []
+        self._new_bands = _GrowingArray(self.b)
+        self._new_sigs = _GrowingArray(self.num_perm)
+        # 每个 band 一个 {桶哈希: [新插入部分的行号]}
+        self._new_buckets = [defaultdict(list) for _ in range(self.b)]
+
+    @staticmethod
+    def _map(path, rows, cols):
+        if rows:
+            return np.memmap(path, dtype=np.uint64, mode='r', shape=(rows, cols))
+        return np.empty((0, cols), dtype=np.uint64)
+
+    def _repair(self, rows, row_bytes, sig_bytes):
+        # 截掉中断写入留下的多余部分，保证后续追加时各文件行号对齐
+        files = [(self.bands_path, row_bytes)]
+        if self.store_signatures:
+            files.append((self.sigs_path, sig_bytes))
+        for path, size in files:
+            if path.exists() and path.stat().st_size != rows * size:
+                with open(path, 'r+b') as f:
+                    f.truncate(rows * size)
+        if self.keys_path.exists():
+            keys_text = ''.join(k + '\n' for k in self.keys)
+            if self.keys_path.stat().st_size != len(keys_text.encode('utf-8')):
+                with open(self.keys_path, 'w', encoding='utf-8', newline='\n') as f:
+                    f.write(keys_text)
+
+    def __len__(self):
+        return len(self.keys) + len(self._new_keys)
+
+    def __contains__(self, key):
+        return key in self.key_set
+
+    def band_hash(self, hashvalues):
+        '''
+        计算签名的各个 band 的桶哈希
+        :param hashvalues: 一维 (num_perm,) 或二维 (n, num_perm) 的 minhash 签名
+        :return: (b,) 或 (n, b) 的 uint64 数组
+        '''
+        hv = np.asarray(hashvalues, dtype=np.uint64)
+        hv = hv[..., :self.b * self.r].reshape(hv.shape[:-1] + (self.b, self.r))
+        h = np.full(hv.shape[:-1], _FNV_OFFSET, dtype=np.uint64)
+        for j in range(self.r):
+            h = (h ^ hv[..., j]) * _FNV_PRIME
+        return h
+
+    def insert(self, key, hashvalues):
+        self.insert_many([(key, hashvalues)])
+
+    def insert_many(self, items):
+        '''批量插入，items 为 (key, hashvalues) 可迭代对象'''
+        unique = {}
+        for k, v in items:
+            if k not in self.key_set and k not in unique:
+                unique[k] = v
+        if not unique:
+            return
+        hv = np.vstack([np.asarray(v, dtype=np.uint64) for v in unique.values()])
+        bands = self.band_hash(hv)
+        start = len(self._new_keys)
+        for i, band in enumerate(bands.tolist()):
+            for j, h in enumerate(band):
+                self._new_buckets[j][h].append(start + i)
+        self._new_keys.extend(unique)
+        self._new_bands.extend(bands)
+        if self.store_signatures:
+            self._new_sigs.extend(hv)
+        self.key_set.update(unique)
+
+    def signature(self, key):
+        '''返回保存的完整签名，需要 store_signatures=True，不存在时返回 None'''
+        if not self.store_signatures or key not in self.key_set:
+            return None
+        if self._key_index is None or len(self._key_index) != len(self):
+            self._key_index = {k: i for i, k in enumerate(self.keys + self._new_keys)}
+        i = self._key_index[key]
+        return self.sigs[i] if i < len(self.keys) else self._new_sigs.view()[i - len(self.keys)]
+
+    def _build_sorted(self):
+        # 每个 band 按桶哈希排序一次，O(b·N·logN)，之后每次查询每个 band 只需一次二分查找
+        bands = np.asarray(self.bands).T
+        self._sorted_rows = np.argsort(bands, axis=1, kind='stable')
+        self._sorted_bands = np.take_along_axis(bands, self._sorted_rows, axis=1)
+
+    def query(self, hashvalues):
+        '''返回至少有一个 band 落在同一个桶里的文章 id，按插入顺序排列'''
+        q = self.band_hash(hashvalues)
+        result = []
+        if len(self.keys):
+            if self._sorted_bands is None:
+                self._build_sorted()
+            hits = []
+            for j, h in enumerate(q):
+                lo = np.searchsorted(self._sorted_bands[j], h, side='left')
+                hi = np.searchsorted(self._sorted_bands[j], h, side='right')
+                if hi > lo:
+                    hits.append(self._sorted_rows[j, lo:hi])
+            if hits:
+                result.extend(self.keys[i] for i in np.unique(np.concatenate(hits)))
+        if self._new_keys:
+            rows = set()
+            for j, h in enumerate(q.tolist()):
+                rows.update(self._new_buckets[j].get(h, ()))
+            result.extend(self._new_keys[i] for i in sorted(rows))
+        return result
+
+    def flush(self):
+        '''将新插入的部分追加到磁盘，先写桶哈希再写 id，中断时以较短的文件为准'''
+        if not self._new_keys:
+            return
+        # windows 下文件被映射时无法追加，先释放旧的映射
+        self.bands = self.sigs = None
+        with open(self.bands_path, 'ab') as f:
+            f.write(self._new_bands.view().tobytes())
+        if self.store_signatures:
+            with open(self.sigs_path, 'ab') as f:
+                f.write(self._new_sigs.view().tobytes())
+        with open(self.keys_path, 'a', encoding='utf-8', newline='\n') as f:
+            f.write(''.join(k + '\n' for k in self._new_keys))
+
+        self.keys.extend(self._new_keys)
+        self._reload()
+        self._reset_new()
+
+    def _reload(self):
+        self.bands = self._map(self.bands_path, len(self.keys), self.b)
+        if self.store_signatures:
+            self.sigs = self._map(self.sigs_path, len(self.keys), self.num_perm)
+        self._key_index = None
+        self._sorted_bands = self._sorted_rows = None
+
+    def remove(self, keys):
+        '''
+        删除 keys 中的文章并重写索引文件，返回实际删除的个数
+        先在 .tmp 目录写好新文件，再整体替换原目录，中断时启动会自动恢复到替换前或替换后
+        '''
+        self.flush()
+        keys = set(keys) & self.key_set
+        if not keys:
+            return 0
+        keep = np.array([k not in keys for k in self.keys], dtype=bool)
+        new_keys = [k for k in self.keys if k not in keys]
+        tmp = self.path.with_name(self.path.name + '.tmp')
+        old = self.path.with_name(self.path.name + '.old')
+        if tmp.exists():
+            shutil.rmtree(tmp)
+        tmp.mkdir()
+        shutil.copy(self.meta_path, tmp / 'meta.json')
+        with open(tmp / 'bands.bin', 'wb') as f:
+            f.write(np.ascontiguousarray(self.bands[keep]).tobytes())
+        if self.store_signatures:
+            with open(tmp / 'signatures.bin', 'wb') as f:
+                f.write(np.ascontiguousarray(self.sigs[keep]).tobytes())
+        with open(tmp / 'keys.txt', 'w', encoding='utf-8', newline='\n') as f:
+            f.write(''.join(k + '\n' for k in new_keys))
+        (tmp / 'complete').touch()
+
+        self.bands = self.sigs = None
+        os.rename(self.path, old)
+        os.rename(tmp, self.path)
+        (self.path / 'complete').unlink()
+        shutil.rmtree(old)
+
+        self.keys = new_keys
+        self.key_set -= keys
+        self._reload()
+        return len(keys)
+
+
+class WindowedLSH:
+    '''
+    按时间窗口划分的 LSH：在线索引只保留最近 window_days 天的文章，过期文章移入冷索引
+    :param path: 在线索引目录，冷索引在同级的 <目录名>_archive 目录
+    :param window_days: 时间窗口（天），None 时不淘汰，退化为单个 PersistentLSH
+    '''
+    def __init__(self, path, window_days=None, threshold=0.8, num_perm=128):
+        self.window_days = window_days
+        self.live = PersistentLSH(path, threshold=threshold, num_perm=num_perm)
+        path = Path(path)
+        self.archive = PersistentLSH(path.with_name(path.name + '_archive'), threshold=threshold, num_perm=num_perm,
+                                     store_signatures=True)
+
+    def __len__(self):
+        return len(self.live)
+
+    def __contains__(self, key):
+        return key in self.live
+
+    def cutoff(self, now=None):
+        '''窗口起点，格式 %Y-%m-%d，与 create_time 直接按字符串比较；不限窗口时返回 None'''
+        if self.window_days is None:
+            return None
+        now = now or datetime.datetime.now()
+        return (now - datetime.timedelta(days=self.window_days)).strftime('%Y-%m-%d')
+
+    def insert(self, key, hashvalues):
+        self.live.insert(key, hashvalues)
+
+    def insert_many(self, items):
+        self.live.insert_many(items)
+
+    def query(self, hashvalues):
+        return self.live.query(hashvalues)
+
+    def query_archive(self, hashvalues, threshold=None):
+        '''
+        按需查询冷索引，返回 [(id, jaccard), ...]，按相似度从高到低排列
+        :param threshold: 只返回 jaccard 不低于该值的文章，默认为建索引时的阈值
+        '''
+        threshold = self.live.threshold if threshold is None else threshold
+        hv = np.asarray(hashvalues, dtype=np.uint64)
+        result = []
+        for key in self.archive.query(hv):
+            sim = np.count_nonzero(self.archive.signature(key) == hv) / len(hv)
+            if sim >= threshold:
+                result.append((key, sim))
+        return sorted(result, key=lambda x: -x[1])
+
+    def evict(self, create_times, signatures, now=None):
+        '''
+        把发布时间早于窗口起点的文章从在线索引移到冷索引
+        :param create_times: {id: create_time}，不在其中的文章（已从 message_info 中移除）同样淘汰
+        :param signatures: {id: 签名}，用于写入冷索引
+        :return: 淘汰的文章 id 集合，没有签名的过期文章无法写入冷索引，留在在线索引中，不计入返回值
+        '''
+        cutoff = self.cutoff(now)
+        if cutoff is None:
+            return set()
+        self.live.flush()
+        expired = {k for k in self.live.keys if create_times.get(k, '') < cutoff}
+        missing = {k for k in expired if k not in signatures}
+        if missing:
+            print(f'{len(missing)} expired messages have no signature, kept in live index')
+            expired -= missing
+        if not expired:
+            return expired
+        # 先写冷索引再删在线索引，中断时文章最多同时存在于两处，不会丢失
+        self.archive.insert_many((k, signatures[k]) for k in expired)
+        self.archive.flush()
+        self.live.remove(expired)
+        return expired
+
+    def flush(self):
+        self.live.flush()
+        self.archive.flush()
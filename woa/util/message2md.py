@@ -11,60 +11,93 @@ import re
 import sys
 from pathlib import Path
 import datetime
-import requests
-from tqdm import tqdm
-from PIL import Image
-from collections import defaultdict
+import hashlib
+import tempfile
 
 # 调试用，执行当前文件时防止路径导入错误
 if sys.argv[0] == __file__:
-    from util import handle_json, check_text_ratio, headers
+    from util import handle_json, check_text_ratio
+    from text_store import TextStore
+    from cover_image import download_covers
+    from valid_index import ValidIndex
+    from message_reader import iter_messages
 else:
-    from .util import handle_json, check_text_ratio, headers
+    from .util import handle_json, check_text_ratio
+    from .text_store import TextStore
+    from .cover_image import download_covers
+    from .valid_index import ValidIndex
+    from .message_reader import iter_messages
 
 
 def get_valid_message(message_info=None):
-    if not message_info:
-        message_info = handle_json('message_info')
-
-    name2fakeid = handle_json('name2fakeid')
-    issues_message = handle_json('issues_message')
-    delete_messages_set = set(issues_message['is_delete'])
-
-    delete_count = 0
-    dup_count = 0
-    md_dict_by_date = defaultdict(list)  # 按日期分割，key=时间，年月日，value=文章
-    md_dict_by_blogger = defaultdict(list)  # 按博主分割，key=博主名，value=文章
-    for k, v in message_info.items():
-        if k not in name2fakeid.keys():
-            continue
-        for m in v['blogs']:
-            # 历史遗留，有些文章没有创建时间，疑似已删除，待验证
-            if not m['create_time']:
-                continue
-            # 去除已删除文章
-            if m['id'] in delete_messages_set:
-                delete_count += 1
-                continue
-            # 按博主分割，不需要文章去重
-            md_dict_by_blogger[k].append(m)
-            # 去掉重复率高的文章
-            if m['id'] in issues_message['dup_minhash'].keys():
-                dup_count += 1
-                continue
-            # 按日期分割，需要文章去重
-            t = datetime.datetime.strptime(m['create_time'],"%Y-%m-%d %H:%M").strftime("%Y-%m-%d")
-            md_dict_by_date[t].append(m)
+    # 从有效文章索引中读取，不再逐篇判断是否删除、是否重复
+    with ValidIndex() as index:
+        # 第一次使用，或传入的message_info与索引中的文章数不一致（有绕过索引的修改）时全量重建
+        if not len(index) or (message_info and len(index) != sum(len(v['blogs']) for v in message_info.values())):
+            messages = ((k, m) for k, v in message_info.items() for m in v['blogs']) if message_info else iter_messages()
+            index.rebuild(messages, handle_json('issues_message'))
+        name2fakeid = handle_json('name2fakeid')
+        md_dict_by_date, md_dict_by_blogger, delete_count, dup_count = index.valid_messages(name2fakeid.keys())
 
     print(f'{delete_count} messages have been deleted')
     print(f'{dup_count} messages have been deduplicated')
     return md_dict_by_date, md_dict_by_blogger
 
 
-def message2md(message_info=None):
-    md_dict_by_date, md_dict_by_blogger = get_valid_message(message_info)
-    # 1. 写入按日期区分的md文件
-    md_by_date = '''---
+class IncrementalWriter:
+    '''
+    增量写入：manifest 记录每个输出文件内容的 sha1，内容与上次相同且文件存在时不替换，
+    博客系统和 git 只会看到真正变化的文件。
+    内容边生成边计算 sha1 并写入同目录的临时文件，不在内存中拼接整个文件；
+    内容变化时用临时文件替换目标文件，没有变化时删除临时文件，中断时不会留下写了一半的文件。
+    '''
+    def __init__(self, manifest_name='md_manifest'):
+        self.manifest_name = manifest_name
+        self.manifest = handle_json(manifest_name)
+        self.written = 0
+        self.skipped = 0
+
+    def write(self, path, content):
+        '''
+        :param content: 文件内容，字符串或字符串片段的可迭代对象（如生成器）
+        :return: 是否写入了文件
+        '''
+        path = str(path)
+        if isinstance(content, str):
+            content = [content]
+        sha1 = hashlib.sha1()
+        fd, tmp = tempfile.mkstemp(prefix='.md.', suffix='.tmp', dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                for chunk in content:
+                    sha1.update(chunk.encode('utf-8'))
+                    f.write(chunk)
+            digest = sha1.hexdigest()
+            if self.manifest.get(path) == digest and os.path.exists(path):
+                os.remove(tmp)
+                self.skipped += 1
+                return False
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        self.manifest[path] = digest
+        self.written += 1
+        return True
+
+    def remove(self, path):
+        path = str(path)
+        os.remove(path)
+        self.manifest.pop(path, None)
+
+    def save(self):
+        handle_json(self.manifest_name, data=self.manifest, compact=True)
+        print(f'{self.written} md files written, {self.skipped} unchanged')
+
+
+def render_by_date(md_dict_by_date, start_date):
+    yield '''---
 layout: post
 title: "微信公众号聚合平台_按时间区分"
 date: 2024-07-29 01:36
@@ -76,22 +109,17 @@ tags:
 ---
 '''
     # 获取所有时间并逆序排列
-    date_list = sorted(md_dict_by_date.keys(), reverse=True)
-    now = datetime.datetime.now()
-    for date in date_list:
+    for date in sorted(md_dict_by_date.keys(), reverse=True):
         # 为方便查看，只保留近半年的
-        if now - datetime.datetime.strptime(date, '%Y-%m-%d') > datetime.timedelta(days=6*30):
+        if date <= start_date:
             continue
-        md_by_date += f'## {date}\n'
+        yield f'## {date}\n'
         for m in md_dict_by_date[date]:
-            md_by_date += f'* [{m["title"]}]({m["link"]})\n'
+            yield f'* [{m["title"]}]({m["link"]})\n'
 
-    md_path = Path(__file__).parent.parent / 'data' / '微信公众号聚合平台_按时间区分.md'
-    with open(md_path, 'w', encoding='utf-8') as f:
-        f.write(md_by_date)
 
-    # 2. 写入按公众号区分的md文件
-    md_by_blogger = '''---
+def render_by_blogger(md_dict_by_blogger, start_time):
+    yield '''---
 layout: post
 title: "微信公众号聚合平台_按公众号区分"
 date: 2024-08-31 02:16
@@ -102,25 +130,79 @@ tags:
     - 微信公众号聚合平台
 ---
 '''
-    md_dict_by_blogger = {k: sorted(v, key=lambda x: x['create_time'], reverse=True) for k, v in md_dict_by_blogger.items()}
     for k, v in md_dict_by_blogger.items():
-        md_by_blogger += f'## {k}\n'
-        for m in v:
-            # 为方便查看，只保留近半年的
-            if now - datetime.datetime.strptime(m['create_time'], '%Y-%m-%d %H:%M') > datetime.timedelta(days=6*30):
-                continue
-            md_by_blogger += f'* [{m["title"]}]({m["link"]})\n'
+        yield f'## {k}\n'
+        for m in sorted(v, key=lambda x: x['create_time'], reverse=True):
+            # 为方便查看，只保留近半年的，已按时间逆序排列，之后的都更早
+            if m['create_time'] < start_time:
+                break
+            yield f'* [{m["title"]}]({m["link"]})\n'
+
+
+def message2md(message_info=None, writer=None):
+    md_dict_by_date, md_dict_by_blogger = get_valid_message(message_info)
+    own_writer = writer is None
+    writer = writer or IncrementalWriter()
+    # 半年前的时间点，与create_time同格式的字符串直接比较，不需要逐篇strptime
+    start = datetime.datetime.now() - datetime.timedelta(days=6*30)
+
+    # 1. 写入按日期区分的md文件
+    md_path = Path(__file__).parent.parent / 'data' / '微信公众号聚合平台_按时间区分.md'
+    writer.write(md_path, render_by_date(md_dict_by_date, start.strftime('%Y-%m-%d')))
 
+    # 2. 写入按公众号区分的md文件
     md_path = Path(__file__).parent.parent / 'data' / '微信公众号聚合平台_按公众号区分.md'
-    with open(md_path, 'w', encoding='utf-8') as f:
-        f.write(md_by_blogger)
+    writer.write(md_path, render_by_blogger(md_dict_by_blogger, start.strftime('%Y-%m-%d %H:%M')))
+
+    if own_writer:
+        writer.save()
+
+
+def clean_text(text):
+    # 替换一些字符，防止 Nunjucks 转义失败
+    text = text.replace('{{', '{ {')
+    text = text.replace('https:', 'https :')
+    text = text.replace('http:', 'http :')
+    text = text.replace('{#', '{ #')
+    for ext in ['.png', '.jpg', '.jpeg', '.gif', '.bmp']:
+        text = text.replace(ext, '')
+    # 去掉html标签，防止转义失败
+    text = re.sub(r'<[^>]*>', '', text)
+    # 去掉大段代码
+    if len(text) > 100 and sum(check_text_ratio(text)) > 0.5:
+        text = ""
+    return text
 
 
-def single_message2md(message_info=None):
+def render_single(_id, d, all_text):
+    yield f'''---
+layout: post
+title: "{d['title']}"
+date: {d['create_time']}
+top: false
+hide: false
+img: /medias/frontcover/{_id.replace('/', '_')}.jpg
+tags: 
+    - 开源项目
+    - 微信公众号聚合平台
+    - {d['oaname']}
+---
+'''
+    yield f'[{d["title"]}]({d["link"]})\n\n'
+    yield '> 仅用于站内搜索，没有排版格式，具体信息请跳转上方微信公众号内链接\n\n'
+    for i, text in enumerate(all_text):
+        if i:
+            yield '\n'
+        yield clean_text(text)
+
+
+def single_message2md(message_info=None, writer=None):
     if not message_info:
         message_info = handle_json('message_info')
     md_dict_by_date, _ = get_valid_message(message_info)
-    message_detail_text = handle_json('message_detail_text')
+    message_detail_text = TextStore()
+    own_writer = writer is None
+    writer = writer or IncrementalWriter()
     # hexo路径
     img_path = r"D:\learning\zejun'blog\Hexo\themes\hexo-theme-matery\source\medias\frontcover"
     md_path = r"D:\learning\zejun'blog\Hexo\source\_posts"
@@ -134,100 +216,46 @@ def single_message2md(message_info=None):
             id2oaname[m['id']] = k
     # - 获取每个id对应的文章信息
     id2message_info = {}
-    now = datetime.datetime.now()
+    start_date = (datetime.datetime.now() - datetime.timedelta(days=15)).strftime('%Y-%m-%d')
     for k, v in md_dict_by_date.items():
-        if now - datetime.datetime.strptime(k, '%Y-%m-%d') > datetime.timedelta(days=15):
+        if k <= start_date:
             continue
         for m in v:
             id2message_info[m['id']] = m
             id2message_info[m['id']]['oaname'] = id2oaname[m['id']]
 
-    # 2. 下载文章封面图
-    all_frontcover_img = os.listdir(img_path)
-    for _id in tqdm(id2message_info.keys(), desc='downloading frontcover img', total=len(id2message_info)):
-        if _id.replace('/', '_') + '.jpg' in all_frontcover_img:
-            continue
-        # 下载处理
-        d = id2message_info[_id]
-        url = d['link']
-        response = requests.get(url=url, headers=headers)
-        msg_cdn_url = re.search(r'var msg_cdn_url = "/*?(.*)"', response.text)
-        if msg_cdn_url:
-            msg_cdn_url = msg_cdn_url.group(1)
-        else:
-            continue
-        img = requests.get(url=msg_cdn_url, headers=headers).content
-        single_img_path = os.path.join(img_path, f"{_id.replace('/', '_')}.jpg")
-        with open(single_img_path, 'wb') as fp:
-            fp.write(img)
-        # 缩放图片，防止封面太大占用空间
-        img = Image.open(single_img_path)
-        # 获取图片尺寸
-        width, height = img.size
-        # 如果高度大于640,进行缩放
-        if width > 640:
-            # 计算缩放比例
-            ratio = 640.0 / width
-            new_height = int(height * ratio)
-            new_width = 640
-            img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            # 保存缩放后的图片
-            img.save(single_img_path)
-
-    # 3. 将近半月的文章写入成单个md文件
+    # 2. 下载文章封面图，线程池下载、进程池缩放
+    all_frontcover_img = set(os.listdir(img_path))
+    todo = [(_id.replace('/', '_'), d['link']) for _id, d in id2message_info.items()
+            if _id.replace('/', '_') + '.jpg' not in all_frontcover_img]
+    download_covers(todo, img_path)
+
+    # 3. 将近半月的文章写入成单个md文件，内容没有变化的不重写
     for _id in id2message_info.keys():
         d = id2message_info[_id]
         d['title'] = d['title'].replace('"', "'")
-        md = f'''---
-layout: post
-title: "{d['title']}"
-date: {d['create_time']}
-top: false
-hide: false
-img: /medias/frontcover/{_id.replace('/', '_')}.jpg
-tags: 
-    - 开源项目
-    - 微信公众号聚合平台
-    - {d['oaname']}
----
-'''
-        md += f'[{d["title"]}]({d["link"]})\n\n'
-        md += '> 仅用于站内搜索，没有排版格式，具体信息请跳转上方微信公众号内链接\n\n'
         all_text = message_detail_text[_id]
         all_text = [all_text] if isinstance(all_text, str) else all_text
-        for i in range(len(all_text)):
-            # 替换一些字符，防止 Nunjucks 转义失败
-            all_text[i] = all_text[i].replace('{{', '{ {')
-            all_text[i] = all_text[i].replace('https:', 'https :')
-            all_text[i] = all_text[i].replace('http:', 'http :')
-            all_text[i] = all_text[i].replace('{#', '{ #')
-            for ext in ['.png', '.jpg', '.jpeg', '.gif', '.bmp']:
-                all_text[i] = all_text[i].replace(ext, '')
-            # 去掉html标签，防止转义失败
-            all_text[i] = re.sub(r'<[^>]*>', '', all_text[i])
-            # 去掉大段代码
-            if len(all_text[i]) > 100 and sum(check_text_ratio(all_text[i])) > 0.5:
-                all_text[i] = ""
-
-        md += '\n'.join(all_text)
-
         single_md_path = os.path.join(md_path, f"{_id.replace('/', '_')}.md")
-        with open(single_md_path, 'w', encoding='utf-8') as f:
-            f.write(md)
+        writer.write(single_md_path, render_single(_id, d, all_text))
 
-    valid_id = [id.replace('/', '_') for id in id2message_info.keys()]
+    valid_id = {id.replace('/', '_') for id in id2message_info.keys()}
     # 4. 删除多余的md文件
     for filename in os.listdir(md_path):
         if filename in ["微信公众号聚合平台.md", "微信公众号聚合平台_byname.md"]:
             continue
         if filename[:-3] not in valid_id:
-            os.remove(os.path.join(md_path, filename))
+            writer.remove(os.path.join(md_path, filename))
 
     # 5. 删除多余的图片
     for filename in os.listdir(img_path):
         if filename[:-4] not in valid_id:
             os.remove(os.path.join(img_path, filename))
 
+    message_detail_text.close()
+    if own_writer:
+        writer.save()
+
 
 if __name__ == '__main__':
     single_message2md()
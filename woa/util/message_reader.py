@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# @Author      : Cao Zejun
+# @Time        : 2026/10/20 10:05
+# @File        : message_reader.py
+# @Software    : Pycharm
+# @description : message_info.json 的流式读取，逐篇返回 (公众号, 文章)，不把整个文件读入内存
+'''
+handle_json('message_info') 会把整个文件解析成字典，随着历史文章增多，每个阶段的峰值内存都跟着增长，
+而生成 title_head、minhash 去重、删除检查其实只需要每篇文章的几个字段或者某个时间段的文章。
+
+iter_messages 按块读取文件，只在 blogs 数组内逐个解析文章对象，按时间、id 过滤，按需只保留部分字段，
+任意时刻内存中只有一个读取块和当前的一篇文章。不依赖 ijson，只用标准库的 json.JSONDecoder.raw_decode。
+
+message_info.json.patch.jsonl 中还没合并的补丁（json_store 的增量写入）同样生效：
+- extend [公众号, 'blogs']：追加在该公众号原有文章之后
+- set [公众号] / set [公众号, 'blogs'] / del [公众号]：该公众号以补丁中的文章为准
+- set [公众号, 'latest_time'] 与文章无关，忽略
+出现其他补丁时退回到完整读取。
+'''
+import json
+from pathlib import Path
+import sys
+
+# 调试用，执行当前文件时防止路径导入错误；直接执行其他文件时本文件作为顶层模块导入，同样不能使用相对导入
+if sys.argv[0] == __file__ or not __package__:
+    from json_store import patch_path, read_json, read_patches
+else:
+    from .json_store import patch_path, read_json, read_patches
+
+data_path = Path(__file__).parent.parent / 'data'
+_decoder = json.JSONDecoder()
+_whitespace = ' \t\n\r'
+
+
+class _JsonStream:
+    '''按块读取的 json 词法流，只支持 message_info 需要的几种操作'''
+    def __init__(self, fp, chunk_size):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        chunk = self.fp.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        # 已经读过的部分丢弃，避免缓冲区无限增长
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _whitespace:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                raise ValueError('message_info.json 不完整')
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f'message_info.json 格式错误，位置 {self.pos} 处应为 {char}')
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                obj, end = _decoder.raw_decode(self.buf, self.pos)
+                # 数字可能被读取块截断，后面还有内容时才认为解析完成
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return obj
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+    def separator(self, close):
+        '''读取 , 返回 True；读取结束符返回 False'''
+        c = self.peek()
+        self.pos += 1
+        if c == ',':
+            return True
+        if c == close:
+            return False
+        raise ValueError(f'message_info.json 格式错误，位置 {self.pos - 1} 处应为 , 或 {close}')
+
+
+def _iter_file(path, chunk_size):
+    with open(path, 'r', encoding='utf-8') as fp:
+        s = _JsonStream(fp, chunk_size)
+        s.expect('{')
+        if s.peek() == '}':
+            return
+        while True:
+            account = s.value()
+            s.expect(':')
+            s.expect('{')
+            if s.peek() != '}':
+                while True:
+                    key = s.value()
+                    s.expect(':')
+                    if key == 'blogs':
+                        s.expect('[')
+                        if s.peek() != ']':
+                            while True:
+                                yield account, s.value()
+                                if not s.separator(']'):
+                                    break
+                        else:
+                            s.expect(']')
+                    else:
+                        s.value()
+                    if not s.separator('}'):
+                        break
+            else:
+                s.expect('}')
+            if not s.separator('}'):
+                break
+
+
+def _patch_overlay(path):
+    '''
+    把补丁整理为每个公众号的 (是否丢弃原有文章, 追加的文章)，无法流式处理的补丁返回 None
+    '''
+    overlay = {}
+    for patch in read_patches(path):
+        op, keys = patch['op'], patch['path']
+        if len(keys) == 2 and keys[1] == 'latest_time':
+            continue
+        if op == 'extend' and len(keys) == 2 and keys[1] == 'blogs':
+            overlay.setdefault(keys[0], [False, []])[1].extend(patch['value'])
+        elif op == 'set' and len(keys) == 1:
+            overlay[keys[0]] = [True, list(patch['value'].get('blogs', []))]
+        elif op == 'set' and len(keys) == 2 and keys[1] == 'blogs':
+            overlay[keys[0]] = [True, list(patch['value'])]
+        elif op == 'del' and len(keys) == 1:
+            overlay[keys[0]] = [True, []]
+        else:
+            return None
+    return overlay
+
+
+def _iter_all(path, chunk_size):
+    if not patch_path(path).exists():
+        if path.exists():
+            yield from _iter_file(path, chunk_size)
+        return
+
+    overlay = _patch_overlay(path)
+    if overlay is None:
+        for account, v in read_json(path).items():
+            for m in v.get('blogs', []):
+                yield account, m
+        return
+
+    def flush(account):
+        _, extra = overlay.pop(account)
+        for m in extra:
+            yield account, m
+
+    current = None
+    if path.exists():
+        for account, m in _iter_file(path, chunk_size):
+            if account != current:
+                # 上一个公众号的原有文章读完，接着返回它的补丁文章
+                if current in overlay:
+                    yield from flush(current)
+                current = account
+            if account in overlay and overlay[account][0]:
+                continue
+            yield account, m
+    if current in overlay:
+        yield from flush(current)
+    # 只出现在补丁中的公众号（新增的，或原来没有文章的）
+    for account in list(overlay):
+        yield from flush(account)
+
+
+def iter_messages(path=data_path / 'message_info.json', since=None, until=None, ids=None, fields=None,
+                  chunk_size=1 << 16):
+    '''
+    逐篇读取 message_info 中的文章
+    :param path: message_info.json 路径
+    :param since: 只返回 create_time >= since 的文章，格式与 create_time 相同，可以只写日期如 '2024-07-01'
+    :param until: 只返回 create_time < until 的文章
+    :param ids: 只返回 id 在其中的文章
+    :param fields: 只保留这些字段，如 ('id', 'link')，默认保留全部
+    :param chunk_size: 每次读取的字符数
+    :return: 生成器，元素为 (公众号名, 文章字典)，按 message_info 中的顺序（只在补丁中有文章的公众号排在最后）
+    '''
+    path = Path(path)
+    ids = set(ids) if ids is not None else None
+    for account, m in _iter_all(path, chunk_size):
+        create_time = m.get('create_time', '')
+        if since is not None and create_time < since:
+            continue
+        if until is not None and create_time >= until:
+            continue
+        if ids is not None and m.get('id') not in ids:
+            continue
+        if fields is not None:
+            m = {f: m.get(f) for f in fields}
+        yield account, m
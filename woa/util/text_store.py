@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# @Author      : Cao Zejun
+# @Time        : 2026/10/17 17:20
+# @File        : text_store.py
+# @Software    : Pycharm
+# @description : 文章正文存储，替代 message_detail_text.json
+'''
+message_detail_text.json 保存了所有爬过的文章正文，每次启动全部读入内存，结束时整个文件重写。
+这里改为 sqlite 单表存储，key 为文章 id，value 为 zlib 压缩后的 json：
+- 按 id 读取时才解压，不需要把所有正文读入内存
+- 新文章只插入一行，不重写整个文件
+- 用法与原来的字典一致：in、[]、get、[]= 赋值
+第一次打开时如果存在旧的 message_detail_text.json，会自动导入并重命名为 message_detail_text.json.migrated
+'''
+from pathlib import Path
+import json
+import sqlite3
+import threading
+import zlib
+
+data_path = Path(__file__).parent.parent / 'data'
+
+
+class TextStore:
+    def __init__(self, path=data_path / 'message_detail_text.db', json_path=data_path / 'message_detail_text.json',
+                 commit_every=200):
+        self.path = Path(path)
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS texts (id TEXT PRIMARY KEY, data BLOB NOT NULL)')
+        self.conn.commit()
+        self.lock = threading.Lock()
+        # 每写入 commit_every 条提交一次，中断时最多丢失这部分
+        self.commit_every = commit_every
+        self._uncommitted = 0
+
+        json_path = Path(json_path)
+        if json_path.exists():
+            self.migrate_from_json(json_path)
+
+    def migrate_from_json(self, json_path):
+        '''从旧的 message_detail_text.json 导入，导入后重命名旧文件，避免重复导入'''
+        with open(json_path, 'r', encoding='utf-8') as f:
+            message_detail_text = json.load(f)
+        with self.lock:
+            self.conn.executemany('INSERT OR REPLACE INTO texts (id, data) VALUES (?, ?)',
+                                  ((k, self._encode(v)) for k, v in message_detail_text.items()))
+            self.conn.commit()
+        json_path.rename(json_path.with_name(json_path.name + '.migrated'))
+        print(f'{len(message_detail_text)} texts migrated from {json_path.name}')
+
+    @staticmethod
+    def _encode(value):
+        return zlib.compress(json.dumps(value, ensure_ascii=False).encode('utf-8'))
+
+    @staticmethod
+    def _decode(data):
+        return json.loads(zlib.decompress(data).decode('utf-8'))
+
+    def __contains__(self, id_):
+        with self.lock:
+            return self.conn.execute('SELECT 1 FROM texts WHERE id = ?', (id_,)).fetchone() is not None
+
+    def __getitem__(self, id_):
+        with self.lock:
+            row = self.conn.execute('SELECT data FROM texts WHERE id = ?', (id_,)).fetchone()
+        if row is None:
+            raise KeyError(id_)
+        return self._decode(row[0])
+
+    def get(self, id_, default=None):
+        try:
+            return self[id_]
+        except KeyError:
+            return default
+
+    def __setitem__(self, id_, value):
+        data = self._encode(value)
+        with self.lock:
+            self.conn.execute('INSERT OR REPLACE INTO texts (id, data) VALUES (?, ?)', (id_, data))
+            self._uncommitted += 1
+            if self._uncommitted >= self.commit_every:
+                self.conn.commit()
+                self._uncommitted = 0
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute('SELECT COUNT(*) FROM texts').fetchone()[0]
+
+    def keys(self):
+        with self.lock:
+            return [row[0] for row in self.conn.execute('SELECT id FROM texts')]
+
+    def commit(self):
+        with self.lock:
+            self.conn.commit()
+            self._uncommitted = 0
+
+    def close(self):
+        self.commit()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+if __name__ == '__main__':
+    # 手动迁移：python util/text_store.py
+    with TextStore() as store:
+        print(f'{len(store)} texts in {store.path}')
@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# @Author      : Cao Zejun
+# @Time        : 2026/10/18 11:05
+# @File        : tokenizer.py
+# @Software    : Pycharm
+# @description : minhash 用的分词，单个汉字为一个词，连续的非汉字、非空格字符为一个词
+'''
+原来的 minHashLSH.split_text 逐字符遍历，英文用 result[-1] += word 拼接，长英文或代码段是平方复杂度。
+这里用一个编译好的正则一次扫描，切分结果与原实现完全一致：
+- [\u4e00-\u9fff]：每个汉字单独成词
+- [^\u4e00-\u9fff ]+：连续的非汉字、非空格字符拼成一个词，空格和汉字都会截断
+iter_tokens 返回生成器，可以直接交给 BatchMinHash.signatures，不需要先生成列表。
+'''
+from collections import deque
+import re
+
+_token_pattern = re.compile(r'[\u4e00-\u9fff]|[^\u4e00-\u9fff ]+')
+
+
+def iter_tokens(text, shingle=1):
+    '''
+    :param text: 文本
+    :param shingle: 大于 1 时返回相邻 shingle 个词拼接成的 n-gram（中文即字符 n-gram），
+                    词数不足 shingle 时返回全部词拼接成的一个 n-gram
+    :return: 生成器
+    '''
+    tokens = (m.group() for m in _token_pattern.finditer(text))
+    if shingle <= 1:
+        yield from tokens
+        return
+
+    window = deque(maxlen=shingle)
+    for t in tokens:
+        window.append(t)
+        if len(window) == shingle:
+            yield ''.join(window)
+    if 0 < len(window) < shingle:
+        yield ''.join(window)
+
+
+def split_text(text, shingle=1):
+    if shingle <= 1:
+        return _token_pattern.findall(text)
+    return list(iter_tokens(text, shingle))
@@ -7,13 +7,26 @@
 # @description : 工具函数，存储一些通用的函数
 
 from pathlib import Path
-import shutil
+import datetime
+import sys
 
 from tqdm import tqdm
 import json
 import requests
 from lxml import etree
 
+# 调试用，执行当前文件时防止路径导入错误；直接执行其他文件时本文件作为顶层模块导入，同样不能使用相对导入
+if sys.argv[0] == __file__ or not __package__:
+    from fetcher import session, DEFAULT_TIMEOUT, HostRateLimiter, fetch_concurrently
+    from valid_index import ValidIndex
+    from message_reader import iter_messages
+    import json_store
+else:
+    from .fetcher import session, DEFAULT_TIMEOUT, HostRateLimiter, fetch_concurrently
+    from .valid_index import ValidIndex
+    from .message_reader import iter_messages
+    from . import json_store
+
 
 headers = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/86.0.4240.198 Safari/537.36',
@@ -21,47 +34,110 @@ headers = {
 
 
 # 检查文章是否正常运行(未被作者删除)
-def message_is_delete(url='', response=None):
+def message_is_delete(url='', response=None, limiter=None):
     if not response:
-        response = requests.get(url=url, headers=headers).text
+        if limiter:
+            limiter.wait(url)
+        response = session.get(url=url, headers=headers, timeout=DEFAULT_TIMEOUT).text
     tree = etree.HTML(response)
+    if tree is None:
+        return False
     warn = tree.xpath('//div[@class="weui-msg__title warn"]/text()')
     if len(warn) > 0 and warn[0] == '该内容已被发布者删除':
         return True
     return False
 
-# 自检函数，更新message_info.json文件
-def update_message_info():
-    message_info = handle_json('message_info')
-    delete_messages = handle_json('delete_message')
-    delete_messages_set = set(delete_messages['is_delete'])
-
-    try:
-        for k, v in tqdm(message_info.items(), total=len(message_info)):
-            for m in v['blogs']:
-                if m['id'] in delete_messages_set:
-                    continue
-                if message_is_delete(m['link']):
-                    delete_messages['is_delete'].append(m['id'])
-    except:
-        pass
-
-    handle_json('message_info', message_info)
-
-def handle_json(file_name, data=None):
-    if not file_name.endswith('.json'):
-        file_name = Path(__file__).parent.parent / 'data' / f'{file_name}.json'
+# 删除检查的间隔（天）：发布7天内每天检查一次，之后间隔随文章年龄增长，为年龄的1/7，最长90天
+def recheck_interval(age_days):
+    return min(max(1.0, age_days / 7), 90.0)
+
+# 自检函数，检查已收集的文章是否被删除，结果追加到issues_message.json的is_delete
+# 每篇文章记录上次检查时间(delete_check.json)，按recheck_interval决定是否到期，每次最多检查max_checks篇
+def update_message_info(max_checks=500, workers=8, rate=5):
+    issues_message = handle_json('issues_message')
+    delete_messages_set = set(issues_message.get('is_delete', []))
+    delete_check = handle_json('delete_check')
+
+    now = datetime.datetime.now()
+    due = []
+    # 流式读取message_info，只保留用到的字段
+    for _, m in iter_messages(fields=('id', 'create_time', 'link')):
+        if m['id'] in delete_messages_set or not m['create_time']:
+            continue
+        create_time = datetime.datetime.strptime(m['create_time'], '%Y-%m-%d %H:%M')
+        # 从未检查过的文章以发布时间作为上次检查时间
+        last_check = datetime.datetime.strptime(delete_check.get(m['id'], m['create_time']), '%Y-%m-%d %H:%M')
+        age_days = (now - create_time).total_seconds() / 86400
+        elapsed_days = (now - last_check).total_seconds() / 86400
+        overdue = elapsed_days / recheck_interval(age_days)
+        if overdue >= 1:
+            due.append((overdue, m))
+    # 逾期越久越先检查
+    due.sort(key=lambda x: x[0], reverse=True)
+    due = [m for _, m in due[:max_checks]]
+
+    limiter = HostRateLimiter(rate=rate)
+
+    def check(m):
+        try:
+            return message_is_delete(m['link'], limiter=limiter)
+        except (requests.RequestException, ValueError) as e:
+            print(f'检查失败 {m["link"]}: {e}')
+            return None
+
+    now_str = now.strftime('%Y-%m-%d %H:%M')
+    new_deleted = []
+    for m, is_delete in tqdm(fetch_concurrently(check, due, workers=workers), total=len(due), desc='checking delete'):
+        # 检查失败的不记录检查时间，下次继续检查
+        if is_delete is None:
+            continue
+        delete_check[m['id']] = now_str
+        if is_delete and m['id'] not in delete_messages_set:
+            new_deleted.append(m['id'])
+            delete_messages_set.add(m['id'])
+    print(f'{len(due)} messages checked, {len(new_deleted)} newly deleted')
+
+    handle_json('delete_check', data=delete_check, compact=True)
+    # 只追加新删除的id，不重写整个issues_message.json
+    patch_json('issues_message', [('extend', ['is_delete'], new_deleted)] if new_deleted else [])
+    with ValidIndex() as index:
+        index.mark_deleted(new_deleted)
+
+def json_path(file_name):
+    # 不带 .json 后缀的视为 data 目录下的文件名，否则视为路径
+    if not str(file_name).endswith('.json'):
+        return Path(__file__).parent.parent / 'data' / f'{file_name}.json'
+    return Path(file_name)
+
+# 读取时会应用未合并的补丁；写入为原子写入（同目录临时文件 + fsync + os.replace），compact=True 时不缩进
+def handle_json(file_name, data=None, compact=False):
+    '''
+    读取或全量写入 data 目录下的 json 文件
+    :param file_name: 不带 .json 后缀的文件名，或 json 文件路径
+    :param data: 为空时读取并返回文件内容（已应用补丁），否则全量写入
+    :param compact: 写入时是否使用紧凑格式
+    :raise ConcurrentModificationError: 全量写入时拒绝覆盖的情况：
+        - 读取之后文件被其他进程重写（全量写入或合并补丁）
+        - 读取之后本进程用 patch_json 追加过补丁，无法确定 data 是否已包含它们
+        - 文件有未合并的补丁，但本进程没有读取过
+        出现时重新调用 handle_json(file_name) 读取最新内容，在其上修改后再写入
+    '''
+    file_name = json_path(file_name)
 
     if not data:
-        if not file_name.exists():
-            return {}
-        with open(file_name, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return json_store.read_json(file_name)
     else:
         # 安全写入，防止在写入过程中中断程序导致数据丢失
-        with open('tmp.json', 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
-        shutil.move('tmp.json', file_name)
+        # 读取之后其他进程追加的补丁会保留
+        json_store.write_json(file_name, data, compact=compact)
+
+# 小改动以补丁追加，不重写整个文件，如 patch_json('issues_message', [('append', ['is_delete'], id)])
+def patch_json(file_name, patches):
+    json_store.append_patch(json_path(file_name), patches)
+
+# 把补丁合并回主文件
+def compact_json(file_name, compact=False):
+    json_store.compact_json(json_path(file_name), compact=compact)
 
 
 def check_text_ratio(text):
@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# @Author      : Cao Zejun
+# @Time        : 2026/10/19 20:15
+# @File        : valid_index.py
+# @Software    : Pycharm
+# @description : 有效文章索引，按日期和公众号分桶的物化视图，供 get_valid_message 直接读取
+'''
+get_valid_message 每次都要加载 message_info、name2fakeid、issues_message，逐篇判断是否删除、是否重复，再按日期和公众号分桶。
+这里把判断结果物化到 sqlite（data/valid_message.db）：
+- 每篇文章一行，记录公众号、在该公众号 blogs 中的位置、日期（create_time 前 10 位）、是否已删除、是否重复
+- 爬到新文章、删除检查、minhash 去重做出判断时直接更新对应的行，不需要重新扫描全部历史
+- 读取时按 (day) 或 (account, pos) 索引查询，顺序与原来遍历 message_info 的顺序一致，生成的 md 完全相同
+message_info 中同一篇文章可能出现多次（历史遗留），因此主键不是文章 id，而是 (account, pos)。
+索引为空时（第一次使用）会从 message_info 和 issues_message 全量建立，也可以手动执行 python util/valid_index.py 重建。
+'''
+from collections import defaultdict
+from pathlib import Path
+import sqlite3
+import threading
+
+data_path = Path(__file__).parent.parent / 'data'
+
+
+class ValidIndex:
+    def __init__(self, path=data_path / 'valid_message.db'):
+        self.path = Path(path)
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS accounts (name TEXT PRIMARY KEY, pos INTEGER NOT NULL);
+            CREATE TABLE IF NOT EXISTS articles (
+                account TEXT NOT NULL,
+                pos INTEGER NOT NULL,
+                id TEXT NOT NULL,
+                day TEXT NOT NULL,
+                create_time TEXT NOT NULL,
+                title TEXT NOT NULL,
+                link TEXT NOT NULL,
+                deleted INTEGER NOT NULL DEFAULT 0,
+                dup INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (account, pos)
+            );
+            CREATE INDEX IF NOT EXISTS idx_articles_id ON articles (id);
+            CREATE INDEX IF NOT EXISTS idx_articles_day ON articles (day);
+        ''')
+        self.conn.commit()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute('SELECT COUNT(*) FROM articles').fetchone()[0]
+
+    def _account_pos(self, account):
+        self.conn.execute('INSERT OR IGNORE INTO accounts (name, pos) VALUES (?, (SELECT COUNT(*) FROM accounts))',
+                          (account,))
+
+    def _insert(self, account, start, blogs, deleted=frozenset(), dup=frozenset()):
+        self.conn.executemany(
+            'INSERT OR REPLACE INTO articles (account, pos, id, day, create_time, title, link, deleted, dup) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            ((account, start + i, m['id'], m['create_time'][:10], m['create_time'], m['title'], m['link'],
+              m['id'] in deleted, m['id'] in dup) for i, m in enumerate(blogs)))
+
+    def add_messages(self, account, blogs):
+        '''公众号的 blogs 末尾新增了文章'''
+        if not blogs:
+            return
+        with self.lock:
+            self._account_pos(account)
+            start = self.conn.execute('SELECT COALESCE(MAX(pos) + 1, 0) FROM articles WHERE account = ?',
+                                      (account,)).fetchone()[0]
+            self._insert(account, start, blogs)
+            self.conn.commit()
+
+    def set_account(self, account, blogs):
+        '''公众号的 blogs 整体变化（如回填后重新排序），按新的顺序重写该公众号，保留已有的删除和重复标记'''
+        with self.lock:
+            self._account_pos(account)
+            rows = self.conn.execute('SELECT id, deleted, dup FROM articles WHERE account = ?', (account,)).fetchall()
+            deleted = {r[0] for r in rows if r[1]}
+            dup = {r[0] for r in rows if r[2]}
+            self.conn.execute('DELETE FROM articles WHERE account = ?', (account,))
+            self._insert(account, 0, blogs, deleted, dup)
+            self.conn.commit()
+
+    def mark_deleted(self, ids):
+        with self.lock:
+            self.conn.executemany('UPDATE articles SET deleted = 1 WHERE id = ?', ((i,) for i in ids))
+            self.conn.commit()
+
+    def mark_dup(self, ids):
+        with self.lock:
+            self.conn.executemany('UPDATE articles SET dup = 1 WHERE id = ?', ((i,) for i in ids))
+            self.conn.commit()
+
+    def rebuild(self, messages, issues_message):
+        '''
+        全量重建
+        :param messages: 按 message_info 顺序的 (公众号, 文章) 可迭代对象，如 message_reader.iter_messages()
+        :param issues_message: issues_message.json 的内容
+        '''
+        deleted = set(issues_message.get('is_delete', []))
+        dup = set(issues_message.get('dup_minhash', {}))
+        with self.lock:
+            self.conn.execute('DELETE FROM articles')
+            self.conn.execute('DELETE FROM accounts')
+            pos = defaultdict(int)
+            for k, m in messages:
+                self._account_pos(k)
+                self._insert(k, pos[k], [m], deleted, dup)
+                pos[k] += 1
+            self.conn.commit()
+
+    def valid_messages(self, accounts, start_day=''):
+        '''
+        :param accounts: 只返回这些公众号的文章（name2fakeid 中的公众号）
+        :param start_day: 只返回该日期（含）之后的文章，格式 %Y-%m-%d
+        :return: (按日期分桶, 按公众号分桶, 已删除数, 重复数)，与原 get_valid_message 的结果相同：
+                 按公众号分桶去掉已删除的文章，按日期分桶再去掉重复的文章
+        '''
+        accounts = set(accounts)
+        md_dict_by_date = defaultdict(list)
+        md_dict_by_blogger = defaultdict(list)
+        delete_count = 0
+        dup_count = 0
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT a.account, a.id, a.create_time, a.title, a.link, a.deleted, a.dup FROM articles a '
+                'JOIN accounts c ON c.name = a.account '
+                "WHERE a.create_time != '' AND a.day >= ? ORDER BY c.pos, a.pos", (start_day,)).fetchall()
+        for account, id_, create_time, title, link, deleted, dup in rows:
+            if account not in accounts:
+                continue
+            if deleted:
+                delete_count += 1
+                continue
+            m = {'title': title, 'create_time': create_time, 'link': link, 'id': id_}
+            md_dict_by_blogger[account].append(m)
+            if dup:
+                dup_count += 1
+                continue
+            md_dict_by_date[create_time[:10]].append(m)
+        return md_dict_by_date, md_dict_by_blogger, delete_count, dup_count
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+if __name__ == '__main__':
+    # 手动重建：python util/valid_index.py
+    from util import handle_json
+    from message_reader import iter_messages
+
+    with ValidIndex() as index:
+        index.rebuild(iter_messages(), handle_json('issues_message'))
+        print(f'{len(index)} messages indexed in {index.path}')
@@ -7,10 +7,13 @@ WZ项目统一数据库管理器
 
 import logging
 import json
+import re
+import threading
+import time
 from datetime import datetime, timezone
 from typing import Dict, List, Any, Optional, Union, Tuple
 from contextlib import contextmanager
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, fields as dataclass_fields
 from enum import Enum
 
 # 尝试导入mysql-connector-python或PyMySQL
@@ -30,6 +33,9 @@ except ImportError:
 
 from .config import get_config
 
+# 连接层面的错误，出现后连接不再复用
+_CONNECTION_ERRORS = (mysql.connector.OperationalError, mysql.connector.InterfaceError)
+
 logger = logging.getLogger(__name__)
 
 class SourceType(Enum):
@@ -109,6 +115,200 @@ class PublishTask:
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
 
+# insert_article和批量写入使用的列，顺序与_article_params一致
+ARTICLE_INSERT_COLUMNS = [
+    'source_type', 'source_name', 'source_id', 'title', 'article_url', 'author',
+    'publish_timestamp', 'crawl_status', 'crawl_attempts', 'crawl_error',
+    'crawled_at', 'content', 'content_html', 'word_count', 'images', 'links', 'tags',
+    'ai_title', 'ai_content', 'ai_summary', 'publish_status', 'fetched_at'
+]
+
+# create_publish_task和批量写入使用的列，顺序与_publish_task_params一致
+PUBLISH_TASK_INSERT_COLUMNS = [
+    'article_id', 'target_platform', 'target_forum_id', 'target_category',
+    'status', 'priority', 'max_attempts', 'custom_title', 'custom_content',
+    'publish_config', 'scheduled_at'
+]
+
+# upsert_articles_bulk遇到已存在的文章时默认更新的列，不覆盖发布状态和首次获取时间
+ARTICLE_UPSERT_COLUMNS = [c for c in ARTICLE_INSERT_COLUMNS
+                          if c not in ('source_type', 'article_url', 'publish_status', 'fetched_at')]
+
+# 文章表中的LONGTEXT列，列表查询默认不读取，由LazyArticle在首次访问时按id补齐
+ARTICLE_HEAVY_COLUMNS = ('content', 'content_html', 'ai_content')
+
+ARTICLE_COLUMNS = [f.name for f in dataclass_fields(Article)]
+
+# summary视图读取的列：除LONGTEXT外的全部列
+ARTICLE_SUMMARY_COLUMNS = [c for c in ARTICLE_COLUMNS if c not in ARTICLE_HEAVY_COLUMNS]
+
+# Article中以JSON存储的列
+ARTICLE_JSON_COLUMNS = ('images', 'links', 'tags', 'publish_status')
+
+class LazyArticle(Article):
+    """
+    只读取了部分列的文章，首次访问未读取的列时按id一次性查询全部未读取的列
+
+    由UnifiedDatabaseManager按summary视图或指定列查询时返回，用法与Article相同；
+    对未读取的列赋值后不会再从数据库读取该列
+    """
+
+    def __getattribute__(self, name):
+        missing = object.__getattribute__(self, '__dict__').get('_missing')
+        if missing and name in missing:
+            object.__getattribute__(self, '_load_missing')()
+        return object.__getattribute__(self, name)
+
+    def __setattr__(self, name, value):
+        missing = self.__dict__.get('_missing')
+        if missing:
+            missing.discard(name)
+        object.__setattr__(self, name, value)
+
+    def _load_missing(self):
+        missing = self.__dict__['_missing']
+        columns = sorted(missing)
+        data = self.__dict__['_loader'](self.id, columns) or {}
+        missing.clear()
+        for column in columns:
+            object.__setattr__(self, column, data.get(column))
+
+    @property
+    def loaded_columns(self) -> List[str]:
+        """已读取的列"""
+        missing = self.__dict__.get('_missing') or ()
+        return [c for c in ARTICLE_COLUMNS if c not in missing]
+
+class PoolTimeoutError(Exception):
+    """连接池在等待时间内没有可用连接"""
+    pass
+
+class ConnectionPool:
+    """
+    有界连接池，兼容mysql-connector-python和PyMySQL
+
+    - 常驻连接最多pool_size个，繁忙时最多再临时创建max_overflow个，归还时超出pool_size的部分直接关闭
+    - 连接数达到上限时取连接会等待，超过timeout秒抛出PoolTimeoutError
+    - 取出时检查连接：存活超过recycle秒的重建；空闲超过pre_ping秒的先ping，失效则重建
+    - 空闲超过idle_timeout秒的连接在下次取还连接时关闭
+    """
+
+    def __init__(self, creator, pool_size: int = 10, max_overflow: int = 20, timeout: float = 30,
+                 recycle: float = 3600, idle_timeout: float = 600, pre_ping: float = 30):
+        self._creator = creator
+        self.pool_size = pool_size
+        self.max_size = pool_size + max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.idle_timeout = idle_timeout
+        self.pre_ping = pre_ping
+
+        self._cond = threading.Condition()
+        # 空闲连接，元素为(连接, 创建时间, 最后归还时间)，后进先出，冷门连接会自然空闲超时被回收
+        self._idle = []
+        self._created_at = {}
+        self._in_use = 0
+        self._closed = False
+
+    def _new_connection(self):
+        conn = self._creator()
+        self._created_at[id(conn)] = time.monotonic()
+        return conn
+
+    def _close_connection(self, conn):
+        self._created_at.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    @staticmethod
+    def _is_alive(conn) -> bool:
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    def _evict_idle(self, now: float) -> List:
+        """取出空闲超时的连接，由调用方在锁外关闭"""
+        expired = [item for item in self._idle if now - item[2] > self.idle_timeout]
+        if expired:
+            self._idle = [item for item in self._idle if now - item[2] <= self.idle_timeout]
+        return [item[0] for item in expired]
+
+    def acquire(self):
+        """取出一个可用连接，用完后必须调用release归还"""
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise Exception("连接池已关闭")
+                now = time.monotonic()
+                expired = self._evict_idle(now)
+                if self._idle:
+                    conn, created, last_used = self._idle.pop()
+                    self._in_use += 1
+                    break
+                if self._in_use + len(self._idle) < self.max_size:
+                    conn = created = last_used = None
+                    self._in_use += 1
+                    break
+                remaining = deadline - now
+                if remaining <= 0:
+                    raise PoolTimeoutError(f"{self.timeout}秒内没有可用的数据库连接（上限{self.max_size}）")
+                self._cond.wait(remaining)
+
+        for c in expired:
+            self._close_connection(c)
+        try:
+            if conn is not None and (now - created > self.recycle
+                                     or (now - last_used > self.pre_ping and not self._is_alive(conn))):
+                # 连接太旧或已失效（如MySQL的wait_timeout断开），重建
+                self._close_connection(conn)
+                conn = None
+            if conn is None:
+                conn = self._new_connection()
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        return conn
+
+    def release(self, conn, discard: bool = False):
+        """
+        归还连接
+
+        Args:
+            conn: acquire取出的连接
+            discard: 连接已损坏时为True，直接关闭不放回池中
+        """
+        close = discard
+        with self._cond:
+            self._in_use -= 1
+            if not close and (self._closed or len(self._idle) >= self.pool_size):
+                close = True
+            if not close:
+                self._idle.append((conn, self._created_at.get(id(conn), time.monotonic()), time.monotonic()))
+            self._cond.notify()
+        if close:
+            self._close_connection(conn)
+
+    def close(self):
+        """关闭所有空闲连接，使用中的连接在归还时关闭"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for conn, _, _ in idle:
+            self._close_connection(conn)
+
+    def stats(self) -> Dict[str, int]:
+        """连接池状态"""
+        with self._cond:
+            return {'idle': len(self._idle), 'in_use': self._in_use, 'max_size': self.max_size}
+
 class UnifiedDatabaseManager:
     """统一数据库管理器"""
     
@@ -120,43 +320,70 @@ class UnifiedDatabaseManager:
             config: 配置对象，如果为None则使用全局配置
         """
         self.config = config or get_config()
-        self.connection = None
-        self._connection_pool = []
+        self._connection_pool = None
         self._pool_size = self.config.database.pool_size
-        
+        # 每个线程当前取出的连接，同一线程内嵌套调用复用同一个连接
+        self._local = threading.local()
+        # article_publish_state表是否存在，首次使用时检查
+        self._publish_state_table = None
+        # 已登记到publish_platforms、物化了待发布行的平台，首次查询待发布文章时读取
+        self._publish_platforms = None
+        # articles表是否有article_url_hash列，首次使用时检查
+        self._url_hash_column = None
+
+    @property
+    def connection(self) -> Optional[ConnectionPool]:
+        """兼容旧接口：已连接时返回连接池，断开后为None"""
+        return self._connection_pool
+
+    def _create_connection(self):
+        """创建一个新的数据库连接"""
+        db_config = self.config.database
+
+        if USING_PYMYSQL:
+            # 使用PyMySQL
+            return mysql.connect(
+                host=db_config.host,
+                port=db_config.port,
+                user=db_config.user,
+                password=db_config.password,
+                database=db_config.database,
+                charset=db_config.charset,
+                autocommit=db_config.autocommit,
+                cursorclass=mysql.cursors.DictCursor
+            )
+        # 使用mysql-connector-python
+        return mysql.connector.connect(
+            host=db_config.host,
+            port=db_config.port,
+            user=db_config.user,
+            password=db_config.password,
+            database=db_config.database,
+            charset=db_config.charset,
+            autocommit=db_config.autocommit
+        )
+
     def connect(self) -> bool:
         """
-        连接数据库
+        创建连接池并验证数据库可以连接
 
         Returns:
             bool: 是否连接成功
         """
+        if self._connection_pool is not None:
+            return True
         try:
             db_config = self.config.database
-
-            if USING_PYMYSQL:
-                # 使用PyMySQL
-                self.connection = mysql.connect(
-                    host=db_config.host,
-                    port=db_config.port,
-                    user=db_config.user,
-                    password=db_config.password,
-                    database=db_config.database,
-                    charset=db_config.charset,
-                    autocommit=db_config.autocommit,
-                    cursorclass=mysql.cursors.DictCursor
-                )
-            else:
-                # 使用mysql-connector-python
-                self.connection = mysql.connector.connect(
-                    host=db_config.host,
-                    port=db_config.port,
-                    user=db_config.user,
-                    password=db_config.password,
-                    database=db_config.database,
-                    charset=db_config.charset,
-                    autocommit=db_config.autocommit
-                )
+            pool = ConnectionPool(
+                self._create_connection,
+                pool_size=self._pool_size,
+                max_overflow=db_config.max_overflow,
+                timeout=db_config.pool_timeout,
+                recycle=db_config.pool_recycle
+            )
+            # 先建立一个连接，数据库不可用时立即返回失败
+            pool.release(pool.acquire())
+            self._connection_pool = pool
 
             logger.info(f"数据库连接成功: {db_config.host}:{db_config.port}/{db_config.database}")
             return True
@@ -166,37 +393,139 @@ class UnifiedDatabaseManager:
             return False
     
     def disconnect(self):
-        """断开数据库连接"""
-        if self.connection:
+        """断开数据库连接，关闭连接池"""
+        if self._connection_pool:
             try:
-                self.connection.close()
+                self._connection_pool.close()
                 logger.info("数据库连接已关闭")
             except Exception as e:
                 logger.error(f"关闭数据库连接失败: {e}")
             finally:
-                self.connection = None
-    
+                self._connection_pool = None
+                self._publish_state_table = None
+                self._publish_platforms = None
+                self._url_hash_column = None
+
     @contextmanager
-    def get_cursor(self):
-        """获取数据库游标的上下文管理器"""
-        if not self.connection:
+    def get_connection(self):
+        """
+        从连接池取出当前线程使用的连接，退出时归还
+        同一线程内嵌套调用返回同一个连接，可以在一个连接上执行多条语句（如事务）
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            yield conn
+            return
+
+        if not self._connection_pool:
             if not self.connect():
                 raise Exception("无法连接到数据库")
 
-        if USING_PYMYSQL:
-            cursor = self.connection.cursor()
-        else:
-            cursor = self.connection.cursor(dictionary=True)
-
+        pool = self._connection_pool
+        conn = pool.acquire()
+        self._local.conn = conn
+        broken = False
         try:
-            yield cursor
-        except Exception as e:
-            if not USING_PYMYSQL or not self.config.database.autocommit:
-                self.connection.rollback()
-            logger.error(f"数据库操作失败: {e}")
+            yield conn
+        except _CONNECTION_ERRORS:
+            # 连接层面的错误（断开、超时），该连接不再放回池中
+            broken = True
             raise
         finally:
-            cursor.close()
+            self._local.conn = None
+            if not broken and not self.config.database.autocommit:
+                # 归还前结束未提交的事务，下一个使用者拿到的是干净的连接
+                try:
+                    conn.rollback()
+                except Exception:
+                    broken = True
+            pool.release(conn, discard=broken)
+    
+    @contextmanager
+    def get_cursor(self):
+        """获取数据库游标的上下文管理器"""
+        with self.get_connection() as conn:
+            if USING_PYMYSQL:
+                cursor = conn.cursor()
+            else:
+                cursor = conn.cursor(dictionary=True)
+
+            try:
+                yield cursor
+            except Exception as e:
+                if not USING_PYMYSQL or not self.config.database.autocommit:
+                    try:
+                        conn.rollback()
+                    except Exception:
+                        pass
+                logger.error(f"数据库操作失败: {e}")
+                raise
+            finally:
+                cursor.close()
+
+    @contextmanager
+    def transaction(self):
+        """
+        在当前线程的连接上开启事务，正常退出时提交，异常时回滚
+        不支持嵌套，事务内的execute_*调用使用同一个连接
+        """
+        with self.get_connection() as conn:
+            if USING_PYMYSQL:
+                conn.begin()
+            else:
+                conn.start_transaction()
+            try:
+                with self.get_cursor() as cursor:
+                    yield cursor
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+    def has_publish_state_table(self) -> bool:
+        """
+        检查article_publish_state和publish_platforms表是否存在，结果在连接期间缓存
+
+        不存在时发布状态只写入articles.publish_status，get_articles_for_publish回退为JSON_EXTRACT查询；
+        执行 python scripts/migrate_database.py --publish-state 创建这两张表并回填
+        """
+        if self._publish_state_table is None:
+            results = self.execute_query(
+                "SELECT table_name FROM information_schema.tables WHERE table_schema = DATABASE() "
+                "AND table_name IN ('article_publish_state', 'publish_platforms')")
+            self._publish_state_table = len(results) == 2
+            if not self._publish_state_table:
+                logger.warning("article_publish_state表不存在，待发布文章查询回退为JSON_EXTRACT扫描，"
+                               "请执行 python scripts/migrate_database.py --publish-state")
+        return self._publish_state_table
+
+    def has_url_hash_column(self) -> bool:
+        """
+        检查articles表是否有article_url_hash列（uk_source_url按完整URL的哈希比较），结果在连接期间缓存
+
+        没有时uk_source_url只比较URL的前255个字符，前缀相同的长URL会被当作同一篇文章；
+        执行 python scripts/migrate_database.py --url-hash 添加该列
+        """
+        if self._url_hash_column is None:
+            results = self.execute_query(
+                "SELECT 1 FROM information_schema.columns WHERE table_schema = DATABASE() "
+                "AND table_name = 'articles' AND column_name = 'article_url_hash'")
+            self._url_hash_column = bool(results)
+            if not results:
+                logger.warning("articles表没有article_url_hash列，前255个字符相同的URL会被当作同一篇文章，"
+                               "请执行 python scripts/migrate_database.py --url-hash")
+        return self._url_hash_column
+
+    def _url_condition(self, count: int) -> str:
+        """按URL查询文章的条件，有article_url_hash列时走uk_source_url比较完整URL的哈希"""
+        if self.has_url_hash_column():
+            return "article_url_hash IN ({})".format(', '.join(['UNHEX(SHA1(%s))'] * count))
+        return "article_url IN ({})".format(', '.join(['%s'] * count))
+
+    def _commit(self):
+        """非自动提交模式下提交当前线程连接上的事务"""
+        if not self.config.database.autocommit:
+            self._local.conn.commit()
     
     def execute_query(self, sql: str, params: Optional[Tuple] = None) -> List[Dict]:
         """
@@ -226,9 +555,9 @@ class UnifiedDatabaseManager:
         """
         with self.get_cursor() as cursor:
             result = cursor.execute(sql, params)
-            if not self.config.database.autocommit:
-                self.connection.commit()
-            return result
+            self._commit()
+            # mysql-connector的execute返回None，影响行数在rowcount中
+            return cursor.rowcount if result is None else result
     
     def execute_insert(self, sql: str, params: Optional[Tuple] = None) -> int:
         """
@@ -243,8 +572,7 @@ class UnifiedDatabaseManager:
         """
         with self.get_cursor() as cursor:
             cursor.execute(sql, params)
-            if not self.config.database.autocommit:
-                self.connection.commit()
+            self._commit()
             return cursor.lastrowid
     
     # ========== 文章管理方法 ==========
@@ -267,17 +595,24 @@ class UnifiedDatabaseManager:
     def insert_article(self, article: Article) -> int:
         """插入新文章"""
         sql = """
-        INSERT INTO articles (
-            source_type, source_name, source_id, title, article_url, author,
-            publish_timestamp, crawl_status, crawl_attempts, crawl_error,
-            crawled_at, content, content_html, word_count, images, links, tags,
-            ai_title, ai_content, ai_summary, publish_status, fetched_at
-        ) VALUES (
-            %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
-        )
-        """
-        
-        params = (
+        INSERT INTO articles ({columns}) VALUES ({placeholders})
+        """.format(columns=', '.join(ARTICLE_INSERT_COLUMNS),
+                   placeholders=', '.join(['%s'] * len(ARTICLE_INSERT_COLUMNS)))
+
+        if not self.has_publish_state_table():
+            return self.execute_insert(sql, self._article_params(article))
+        # 同时写入article_publish_state，已采集完成的文章进入各平台的待发布队列
+        with self.transaction() as cursor:
+            cursor.execute(sql, self._article_params(article))
+            article_id = cursor.lastrowid
+            self._write_publish_state(cursor, [(article_id, platform, status)
+                                               for platform, status in (article.publish_status or {}).items()])
+            self._sync_publish_queue(cursor, [article_id])
+        return article_id
+
+    def _article_params(self, article: Article) -> Tuple:
+        """按ARTICLE_INSERT_COLUMNS的顺序生成插入参数"""
+        return (
             article.source_type, article.source_name, article.source_id,
             article.title, article.article_url, article.author,
             article.publish_timestamp, article.crawl_status, article.crawl_attempts,
@@ -290,9 +625,144 @@ class UnifiedDatabaseManager:
             json.dumps(article.publish_status) if article.publish_status else None,
             article.fetched_at or datetime.now()
         )
-        
-        return self.execute_insert(sql, params)
-    
+
+    def get_article_ids_by_urls(self, source_type: str, urls: List[str], chunk_size: int = 500,
+                                for_update: bool = False) -> Dict[str, int]:
+        """
+        批量查询已存在的文章，每chunk_size个URL一次IN查询
+
+        Args:
+            source_type: 源类型
+            urls: 文章URL列表
+            chunk_size: 每次IN查询的URL数
+            for_update: 在transaction()中使用，加锁读取（SELECT ... FOR UPDATE），
+                        事务结束前其他连接不能插入或修改这些URL
+
+        Returns:
+            Dict[str, int]: 已存在的URL到文章ID的映射
+        """
+        urls = list(dict.fromkeys(urls))
+        result = {}
+        for i in range(0, len(urls), chunk_size):
+            chunk = urls[i:i + chunk_size]
+            sql = "SELECT id, article_url FROM articles WHERE source_type = %s AND " + self._url_condition(len(chunk))
+            if for_update:
+                sql += " FOR UPDATE"
+            for row in self.execute_query(sql, (source_type, *chunk)):
+                result[row['article_url']] = row['id']
+        return result
+
+    def insert_articles_bulk(self, articles: List[Article], chunk_size: int = 200) -> List[Tuple[str, Optional[int]]]:
+        """
+        批量插入文章，已存在（uk_source_url冲突）的跳过
+
+        Returns:
+            List[Tuple[str, Optional[int]]]: 与articles一一对应的(结果, 文章ID)，结果为'inserted'或'skipped'
+        """
+        return self._write_articles_bulk(articles, None, chunk_size)
+
+    def upsert_articles_bulk(self, articles: List[Article], update_columns: Optional[List[str]] = None,
+                             chunk_size: int = 200) -> List[Tuple[str, Optional[int]]]:
+        """
+        批量插入或更新文章，按uk_source_url (source_type, article_url_hash)判断是否已存在
+
+        Args:
+            articles: 文章列表
+            update_columns: 已存在时更新的列，默认为ARTICLE_UPSERT_COLUMNS（不覆盖发布状态和首次获取时间）
+            chunk_size: 每条INSERT语句的行数
+
+        Returns:
+            List[Tuple[str, Optional[int]]]: 与articles一一对应的(结果, 文章ID)，结果为'inserted'或'updated'
+        """
+        update_columns = update_columns or ARTICLE_UPSERT_COLUMNS
+        unknown = set(update_columns) - set(ARTICLE_INSERT_COLUMNS)
+        if unknown:
+            raise ValueError(f"不支持更新的列: {unknown}")
+        return self._write_articles_bulk(articles, update_columns, chunk_size)
+
+    def _write_articles_bulk(self, articles: List[Article], update_columns: Optional[List[str]],
+                             chunk_size: int) -> List[Tuple[str, Optional[int]]]:
+        """
+        分块执行多行INSERT ... ON DUPLICATE KEY UPDATE，每块只需：一次IN查询已存在的URL、一条多行写入、一次IN查询文章ID
+        update_columns为None时冲突行不做修改（只插入）
+
+        已存在的URL在写入的同一事务中加锁查询，其他连接同时写入相同URL时会等待本事务结束，
+        因此每篇文章的结果（inserted/skipped/updated）在并发写入时也是准确的
+        """
+        if update_columns:
+            on_duplicate = ', '.join(f"{c} = VALUES({c})" for c in update_columns) + ', updated_at = NOW()'
+            existed_outcome = 'updated'
+        else:
+            on_duplicate = 'id = id'
+            existed_outcome = 'skipped'
+        row_placeholder = '(' + ', '.join(['%s'] * len(ARTICLE_INSERT_COLUMNS)) + ')'
+
+        # 同一批中重复的URL：插入时只写第一篇；更新时全部写入，后面的覆盖前面的
+        if update_columns:
+            order = list(range(len(articles)))
+        else:
+            first_index = {}
+            for i, article in enumerate(articles):
+                first_index.setdefault((article.source_type, article.article_url), i)
+            order = sorted(first_index.values())
+
+        # 写入了publish_status的文章同步article_publish_state：新插入的，以及更新了publish_status列的
+        sync_existed = bool(update_columns) and 'publish_status' in update_columns
+
+        ids = {}
+        existed = set()
+        written = set()
+        for start in range(0, len(order), chunk_size):
+            chunk = [articles[i] for i in order[start:start + chunk_size]]
+            keys = {(a.source_type, a.article_url) for a in chunk}
+            by_source = {}
+            for source_type, url in keys:
+                by_source.setdefault(source_type, []).append(url)
+
+            # 每块的文章和发布状态在同一个事务中写入
+            with self.transaction() as cursor:
+                for source_type, urls in by_source.items():
+                    for url in self.get_article_ids_by_urls(source_type, urls, for_update=True):
+                        # 本次调用前面的块刚插入的不算已存在
+                        if (source_type, url) not in ids:
+                            existed.add((source_type, url))
+
+                sql = "INSERT INTO articles ({}) VALUES {} ON DUPLICATE KEY UPDATE {}".format(
+                    ', '.join(ARTICLE_INSERT_COLUMNS), ', '.join([row_placeholder] * len(chunk)), on_duplicate)
+                params = tuple(p for a in chunk for p in self._article_params(a))
+                cursor.execute(sql, params)
+
+                # 多行插入时各行的自增ID不一定连续，重新查询一次
+                for source_type, urls in by_source.items():
+                    for url, article_id in self.get_article_ids_by_urls(source_type, urls).items():
+                        ids[(source_type, url)] = article_id
+
+                # 新插入的文章写入其发布状态；更新了publish_status的已有文章（包括本次前面刚插入的）整体替换，
+                # 删除已移除的平台。同一URL出现多次时后面的覆盖前面的，与ON DUPLICATE KEY UPDATE的结果一致
+                state = {}
+                for article in chunk:
+                    key = (article.source_type, article.article_url)
+                    if key not in existed and key not in written:
+                        written.add(key)
+                        if article.publish_status:
+                            state[ids[key]] = article.publish_status
+                    elif sync_existed:
+                        state[ids[key]] = article.publish_status
+                self._replace_publish_state(cursor, state)
+                # 采集状态、采集时间可能随更新改变，同步待发布队列
+                self._sync_publish_queue(cursor, list({ids[(a.source_type, a.article_url)] for a in chunk}))
+
+        outcomes = []
+        seen = set()
+        for article in articles:
+            key = (article.source_type, article.article_url)
+            if key in existed or key in seen:
+                outcomes.append((existed_outcome, ids.get(key)))
+            else:
+                outcomes.append(('inserted', ids.get(key)))
+            seen.add(key)
+        return outcomes
+
     def update_article(self, article: Article) -> int:
         """更新文章"""
         sql = """
@@ -320,29 +790,101 @@ class UnifiedDatabaseManager:
             article.id
         )
         
-        return self.execute_update(sql, params)
+        # 发布状态整体替换，article_publish_state同步替换
+        with self.transaction() as cursor:
+            cursor.execute(sql, params)
+            updated = cursor.rowcount
+            self._replace_publish_state(cursor, {article.id: article.publish_status})
+            self._sync_publish_queue(cursor, [article.id])
+        return updated
     
-    def get_article_by_id(self, article_id: int) -> Optional[Article]:
-        """根据ID获取文章"""
-        sql = "SELECT * FROM articles WHERE id = %s"
+    def _article_columns(self, fields: Union[str, List[str]]) -> List[str]:
+        """
+        将视图名或列名列表转换为要查询的列
+
+        Args:
+            fields: "full"读取全部列，"summary"读取除LONGTEXT外的列，或者指定列名列表（总是包含id）
+
+        Returns:
+            List[str]: 要查询的列
+        """
+        if fields == "full":
+            return list(ARTICLE_COLUMNS)
+        if fields == "summary":
+            return list(ARTICLE_SUMMARY_COLUMNS)
+        if isinstance(fields, str):
+            raise ValueError(f"未知的文章视图: {fields}")
+
+        unknown = [c for c in fields if c not in ARTICLE_COLUMNS]
+        if unknown:
+            raise ValueError(f"未知的文章列: {unknown}")
+        return ['id'] + [c for c in ARTICLE_COLUMNS if c in fields and c != 'id']
+
+    def _article_select(self, columns: List[str], alias: str = "") -> str:
+        """生成SELECT的列部分，读取全部列时仍使用*"""
+        prefix = f"{alias}." if alias else ""
+        if len(columns) == len(ARTICLE_COLUMNS):
+            return f"{prefix}*"
+        return ", ".join(f"{prefix}`{c}`" for c in columns)
+
+    def _load_article_columns(self, article_id: int, columns: List[str]) -> Optional[Dict]:
+        """读取单篇文章的指定列，供LazyArticle补齐未读取的列"""
+        sql = f"SELECT {self._article_select(columns)} FROM articles WHERE id = %s"
+        results = self.execute_query(sql, (article_id,))
+        if not results:
+            return None
+        return self._decode_article_json(results[0])
+
+    def get_article_by_id(self, article_id: int, fields: Union[str, List[str]] = "full") -> Optional[Article]:
+        """
+        根据ID获取文章
+
+        Args:
+            article_id: 文章ID
+            fields: "full"、"summary"或列名列表，未读取的列在首次访问时再查询
+        """
+        columns = self._article_columns(fields)
+        sql = f"SELECT {self._article_select(columns)} FROM articles WHERE id = %s"
         results = self.execute_query(sql, (article_id,))
         
         if results:
-            return self._dict_to_article(results[0])
+            return self._dict_to_article(results[0], columns)
         return None
     
-    def get_article_by_url(self, source_type: str, article_url: str) -> Optional[Article]:
-        """根据URL获取文章"""
-        sql = "SELECT * FROM articles WHERE source_type = %s AND article_url = %s"
+    def get_article_by_url(self, source_type: str, article_url: str,
+                           fields: Union[str, List[str]] = "full") -> Optional[Article]:
+        """
+        根据URL获取文章
+
+        只判断文章是否存在时使用get_article_ids_by_urls，不读取文章内容
+
+        Args:
+            source_type: 源类型
+            article_url: 文章URL
+            fields: "full"、"summary"或列名列表，未读取的列在首次访问时再查询
+        """
+        columns = self._article_columns(fields)
+        sql = f"SELECT {self._article_select(columns)} FROM articles WHERE source_type = %s AND {self._url_condition(1)}"
         results = self.execute_query(sql, (source_type, article_url))
         
         if results:
-            return self._dict_to_article(results[0])
+            return self._dict_to_article(results[0], columns)
         return None
     
-    def get_pending_articles(self, source_type: Optional[str] = None, limit: int = 100) -> List[Article]:
-        """获取待采集的文章列表"""
-        sql = "SELECT * FROM articles WHERE crawl_status = %s"
+    def get_pending_articles(self, source_type: Optional[str] = None, limit: int = 100,
+                             fields: Union[str, List[str]] = "summary") -> List[Article]:
+        """
+        获取待采集的文章列表
+
+        默认只读取summary视图，不读取content、content_html、ai_content，访问时再按篇查询
+
+        Args:
+            source_type: 源类型过滤
+            limit: 限制数量
+            fields: "full"、"summary"或列名列表
+        """
+        columns = self._article_columns(fields)
+        sql = f"SELECT {self._article_select(columns)} FROM articles WHERE crawl_status = %s"
         params = [CrawlStatus.PENDING.value]
         
         if source_type:
@@ -353,7 +895,7 @@ class UnifiedDatabaseManager:
         params.append(limit)
         
         results = self.execute_query(sql, tuple(params))
-        return [self._dict_to_article(row) for row in results]
+        return [self._dict_to_article(row, columns) for row in results]
     
     def update_crawl_status(self, article_id: int, status: str, content: Optional[str] = None,
                            content_html: Optional[str] = None, word_count: int = 0,
@@ -381,57 +923,245 @@ class UnifiedDatabaseManager:
             error_message, article_id
         )
         
-        return self.execute_update(sql, params)
+        if not self.has_publish_state_table():
+            return self.execute_update(sql, params)
+        # 采集完成的文章进入待发布队列，重新采集的移出
+        with self.transaction() as cursor:
+            cursor.execute(sql, params)
+            updated = cursor.rowcount
+            self._sync_publish_queue(cursor, [article_id])
+        return updated
     
-    def get_articles_for_publish(self, platform: Optional[str] = None, limit: int = 100) -> List[Article]:
-        """获取待发布的文章"""
-        sql = """
-        SELECT * FROM articles 
-        WHERE crawl_status = %s 
-        AND (publish_status IS NULL OR JSON_EXTRACT(publish_status, '$."{}") IS NULL OR JSON_EXTRACT(publish_status, '$."{}") = 'pending')
-        ORDER BY crawled_at ASC 
-        LIMIT %s
-        """.format(platform or "all", platform or "all")
-        
-        results = self.execute_query(sql, (CrawlStatus.COMPLETED.value, limit))
-        return [self._dict_to_article(row) for row in results]
+    def get_articles_for_publish(self, platform: Optional[str] = None, limit: int = 100,
+                                 after: Optional[Tuple[Optional[datetime], int]] = None,
+                                 fields: Union[str, List[str]] = "full") -> List[Article]:
+        """
+        获取待发布的文章：已采集完成，且在该平台没有发布状态或状态为pending，按采集时间先后返回
+
+        待发布的文章在article_publish_state中物化为pending行，沿idx_publish_queue (platform, status, crawled_at,
+        article_id)索引直接读取前limit行，再按主键读取文章，不扫描已发布的文章；平台首次查询时登记并回填一次。
+        未执行sql/004_article_publish_state.sql时回退为JSON_EXTRACT
+
+        Args:
+            platform: 发布平台，为None时与原来一样使用"all"
+            limit: 返回的文章数
+            after: 上一页最后一篇文章的(crawled_at, id)，传入时从其后继续取下一页
+            fields: "full"、"summary"或列名列表，只需要标题等信息时传"summary"
+        """
+        columns = self._article_columns(fields)
+        platform = platform or "all"
+        if self.has_publish_state_table():
+            self._ensure_publish_platform(platform)
+            sql = f"""
+            SELECT {self._article_select(columns, "a")} FROM article_publish_state s
+            JOIN articles a ON a.id = s.article_id
+            WHERE s.platform = %s AND s.status = %s AND a.crawl_status = %s
+            """
+            params = [platform, PublishStatus.PENDING.value, CrawlStatus.COMPLETED.value]
+            order_by, crawled_at_col, id_col = "s.crawled_at ASC, s.article_id ASC", "s.crawled_at", "s.article_id"
+        else:
+            path = self._publish_status_path(platform)
+            sql = f"""
+            SELECT {self._article_select(columns, "a")} FROM articles a
+            WHERE a.crawl_status = %s
+            AND (a.publish_status IS NULL OR JSON_EXTRACT(a.publish_status, %s) IS NULL
+                 OR JSON_UNQUOTE(JSON_EXTRACT(a.publish_status, %s)) = %s)
+            """
+            params = [CrawlStatus.COMPLETED.value, path, path, PublishStatus.PENDING.value]
+            order_by, crawled_at_col, id_col = "a.crawled_at ASC, a.id ASC", "a.crawled_at", "a.id"
+
+        if after is not None:
+            crawled_at, last_id = after
+            if crawled_at is None:
+                sql += f" AND ({crawled_at_col} IS NOT NULL OR {id_col} > %s)"
+                params.append(last_id)
+            else:
+                sql += f" AND ({crawled_at_col} > %s OR ({crawled_at_col} = %s AND {id_col} > %s))"
+                params.extend([crawled_at, crawled_at, last_id])
+
+        sql += f" ORDER BY {order_by} LIMIT %s"
+        params.append(limit)
+
+        results = self.execute_query(sql, tuple(params))
+        return [self._dict_to_article(row, columns) for row in results]
     
-    def update_publish_status(self, article_id: int, platform: str, status: str):
-        """更新发布状态"""
-        # 先获取当前的发布状态
-        article = self.get_article_by_id(article_id)
-        if not article:
-            return False
-        
-        publish_status = article.publish_status or {}
-        publish_status[platform] = status
-        
-        sql = "UPDATE articles SET publish_status = %s, updated_at = NOW() WHERE id = %s"
-        return self.execute_update(sql, (json.dumps(publish_status), article_id))
+    def update_publish_status(self, article_id: int, platform: str, status: str) -> int:
+        """
+        更新发布状态，JSON_SET在一条语句内完成，不读取文章，并发更新不同平台时不会互相覆盖
+
+        Returns:
+            int: 影响的行数，文章不存在时为0
+        """
+        sql = """
+        UPDATE articles SET
+            publish_status = JSON_SET(COALESCE(publish_status, JSON_OBJECT()), %s, %s),
+            updated_at = NOW()
+        WHERE id = %s
+        """
+        with self.transaction() as cursor:
+            cursor.execute(sql, (self._publish_status_path(platform), status, article_id))
+            updated = cursor.rowcount
+            if updated:
+                self._write_publish_state(cursor, [(article_id, platform, status)])
+                self._sync_publish_queue(cursor, [article_id])
+        return updated
+
+    def update_publish_status_bulk(self, article_ids: List[int], platform: str, status: str,
+                                   chunk_size: int = 500) -> int:
+        """
+        批量更新同一平台的发布状态，每chunk_size篇文章一条UPDATE
+
+        Returns:
+            int: 影响的总行数
+        """
+        path = self._publish_status_path(platform)
+        article_ids = list(dict.fromkeys(article_ids))
+        updated = 0
+        for start in range(0, len(article_ids), chunk_size):
+            chunk = article_ids[start:start + chunk_size]
+            sql = """
+            UPDATE articles SET
+                publish_status = JSON_SET(COALESCE(publish_status, JSON_OBJECT()), %s, %s),
+                updated_at = NOW()
+            WHERE id IN ({})
+            """.format(', '.join(['%s'] * len(chunk)))
+            with self.transaction() as cursor:
+                cursor.execute(sql, (path, status, *chunk))
+                updated += cursor.rowcount
+                if not self.has_publish_state_table():
+                    continue
+                # 只为存在的文章写入状态，不存在的id会违反外键
+                cursor.execute("SELECT id FROM articles WHERE id IN ({})".format(', '.join(['%s'] * len(chunk))),
+                               tuple(chunk))
+                rows = cursor.fetchall()
+                self._write_publish_state(cursor, [(row['id'], platform, status) for row in rows])
+                self._sync_publish_queue(cursor, [row['id'] for row in rows])
+        return updated
+
+    def _write_publish_state(self, cursor, rows: List[Tuple[int, str, str]]):
+        """写入article_publish_state，rows为(文章ID, 平台, 状态)，已存在的覆盖状态；表不存在时跳过"""
+        if not rows or not self.has_publish_state_table():
+            return
+        sql = """
+        INSERT INTO article_publish_state (article_id, platform, status) VALUES {}
+        ON DUPLICATE KEY UPDATE status = VALUES(status)
+        """.format(', '.join(['(%s, %s, %s)'] * len(rows)))
+        cursor.execute(sql, tuple(v for row in rows for v in row))
+
+    def _replace_publish_state(self, cursor, publish_status: Dict[int, Optional[Dict[str, str]]]):
+        """用文章当前的publish_status整体替换其在article_publish_state中的行，删除已移除的平台"""
+        if not publish_status or not self.has_publish_state_table():
+            return
+        article_ids = list(publish_status)
+        cursor.execute("DELETE FROM article_publish_state WHERE article_id IN ({})".format(
+            ', '.join(['%s'] * len(article_ids))), tuple(article_ids))
+        self._write_publish_state(cursor, [(article_id, platform, status)
+                                           for article_id, status_map in publish_status.items()
+                                           for platform, status in (status_map or {}).items()])
+
+    def _sync_publish_queue(self, cursor, article_ids: List[int]):
+        """
+        按文章当前的采集状态同步待发布队列：已采集完成的文章在每个登记的平台都有一行状态（没有时补pending），
+        crawled_at与文章一致；未采集完成的文章删除pending行（与没有状态等价）。表不存在时跳过
+        """
+        if not article_ids or not self.has_publish_state_table():
+            return
+        placeholders = ', '.join(['%s'] * len(article_ids))
+        cursor.execute(f"""
+        DELETE s FROM article_publish_state s JOIN articles a ON a.id = s.article_id
+        WHERE s.article_id IN ({placeholders}) AND s.status = %s AND a.crawl_status != %s
+        """, (*article_ids, PublishStatus.PENDING.value, CrawlStatus.COMPLETED.value))
+        cursor.execute(f"""
+        INSERT IGNORE INTO article_publish_state (article_id, platform, status, crawled_at)
+        SELECT a.id, p.platform, %s, a.crawled_at FROM articles a CROSS JOIN publish_platforms p
+        WHERE a.id IN ({placeholders}) AND a.crawl_status = %s
+        """, (PublishStatus.PENDING.value, *article_ids, CrawlStatus.COMPLETED.value))
+        cursor.execute(f"""
+        UPDATE article_publish_state s JOIN articles a ON a.id = s.article_id
+        SET s.crawled_at = a.crawled_at
+        WHERE s.article_id IN ({placeholders}) AND NOT (s.crawled_at <=> a.crawled_at)
+        """, tuple(article_ids))
+
+    def _ensure_publish_platform(self, platform: str):
+        """
+        平台首次查询待发布文章时登记到publish_platforms，并为已采集完成的文章回填pending行（只执行一次）；
+        之后写入文章时由_sync_publish_queue维护该平台的待发布行
+        """
+        if self._publish_platforms is None:
+            self._publish_platforms = {row['platform'] for row in
+                                       self.execute_query("SELECT platform FROM publish_platforms")}
+        if platform in self._publish_platforms:
+            return
+        self._publish_status_path(platform)
+        # 先提交登记，之后写入的文章由_sync_publish_queue补齐；回填覆盖登记之前已采集完成的文章
+        self.execute_update("INSERT IGNORE INTO publish_platforms (platform) VALUES (%s)", (platform,))
+        with self.transaction() as cursor:
+            cursor.execute("""
+            INSERT IGNORE INTO article_publish_state (article_id, platform, status, crawled_at)
+            SELECT id, %s, %s, crawled_at FROM articles WHERE crawl_status = %s
+            """, (platform, PublishStatus.PENDING.value, CrawlStatus.COMPLETED.value))
+            logger.info(f"登记发布平台{platform}，回填了{cursor.rowcount}篇待发布文章")
+        self._publish_platforms.add(platform)
+
+    @staticmethod
+    def _publish_status_path(platform: str) -> str:
+        """平台名对应的JSON路径，作为参数传入SQL，平台名只允许字母、数字、下划线、点和横线"""
+        if not platform or not re.fullmatch(r'[A-Za-z0-9_.\-]+', platform):
+            raise ValueError(f"无效的平台名: {platform!r}")
+        return f'$."{platform}"'
     
     # ========== 发布任务管理方法 ==========
     
     def create_publish_task(self, task: PublishTask) -> int:
         """创建发布任务"""
         sql = """
-        INSERT INTO publish_tasks (
-            article_id, target_platform, target_forum_id, target_category,
-            status, priority, max_attempts, custom_title, custom_content,
-            publish_config, scheduled_at
-        ) VALUES (
-            %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
-        )
-        """
-        
-        params = (
+        INSERT INTO publish_tasks ({columns}) VALUES ({placeholders})
+        """.format(columns=', '.join(PUBLISH_TASK_INSERT_COLUMNS),
+                   placeholders=', '.join(['%s'] * len(PUBLISH_TASK_INSERT_COLUMNS)))
+
+        return self.execute_insert(sql, self._publish_task_params(task))
+
+    def _publish_task_params(self, task: PublishTask) -> Tuple:
+        """按PUBLISH_TASK_INSERT_COLUMNS的顺序生成插入参数"""
+        return (
             task.article_id, task.target_platform, task.target_forum_id,
             task.target_category, task.status, task.priority, task.max_attempts,
             task.custom_title, task.custom_content,
             json.dumps(task.publish_config) if task.publish_config else None,
             task.scheduled_at
         )
-        
-        return self.execute_insert(sql, params)
+
+    def create_publish_tasks_bulk(self, tasks: List[PublishTask], chunk_size: int = 500) -> List[int]:
+        """
+        批量创建发布任务，每chunk_size个任务一条多行INSERT
+
+        Returns:
+            List[int]: 与tasks一一对应的任务ID
+        """
+        row_placeholder = '(' + ', '.join(['%s'] * len(PUBLISH_TASK_INSERT_COLUMNS)) + ')'
+        ids = []
+        for start in range(0, len(tasks), chunk_size):
+            chunk = tasks[start:start + chunk_size]
+            sql = "INSERT INTO publish_tasks ({}) VALUES {}".format(
+                ', '.join(PUBLISH_TASK_INSERT_COLUMNS), ', '.join([row_placeholder] * len(chunk)))
+            params = tuple(p for t in chunk for p in self._publish_task_params(t))
+            with self.get_connection():
+                # innodb_autoinc_lock_mode=2时并发插入的自增ID会交错，不能由lastrowid推算，插入后重新查询一次：
+                # 在插入前建立一致性读快照（REPEATABLE READ），快照之后其他事务提交的行不可见，
+                # 快照之前提交的行ID都小于本次插入的第一行，因此ID不小于lastrowid的可见行就是本次插入的行
+                with self.get_cursor() as cursor:
+                    cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+                with self.transaction() as cursor:
+                    cursor.execute("SELECT 1 FROM publish_tasks LIMIT 1")
+                    cursor.fetchall()
+                    cursor.execute(sql, params)
+                    cursor.execute("SELECT id FROM publish_tasks WHERE id >= %s ORDER BY id", (cursor.lastrowid,))
+                    # 同一条INSERT中各行的ID按VALUES的顺序递增
+                    chunk_ids = [row['id'] for row in cursor.fetchall()]
+                    if len(chunk_ids) != len(chunk):
+                        raise RuntimeError(f"插入了{len(chunk)}个发布任务，查询到{len(chunk_ids)}个ID")
+            ids.extend(chunk_ids)
+        return ids
     
     def get_pending_publish_tasks(self, platform: Optional[str] = None, limit: int = 50) -> List[PublishTask]:
         """获取待处理的发布任务"""
@@ -520,19 +1250,30 @@ class UnifiedDatabaseManager:
     
     # ========== 辅助方法 ==========
     
-    def _dict_to_article(self, data: Dict) -> Article:
-        """将字典转换为Article对象"""
-        # 处理JSON字段
-        if data.get('images'):
-            data['images'] = json.loads(data['images']) if isinstance(data['images'], str) else data['images']
-        if data.get('links'):
-            data['links'] = json.loads(data['links']) if isinstance(data['links'], str) else data['links']
-        if data.get('tags'):
-            data['tags'] = json.loads(data['tags']) if isinstance(data['tags'], str) else data['tags']
-        if data.get('publish_status'):
-            data['publish_status'] = json.loads(data['publish_status']) if isinstance(data['publish_status'], str) else data['publish_status']
+    def _decode_article_json(self, data: Dict) -> Dict:
+        """处理文章的JSON字段"""
+        for column in ARTICLE_JSON_COLUMNS:
+            if data.get(column) and isinstance(data[column], str):
+                data[column] = json.loads(data[column])
+        return data
+
+    def _dict_to_article(self, data: Dict, columns: Optional[List[str]] = None) -> Article:
+        """
+        将字典转换为Article对象
+
+        Args:
+            data: 查询结果
+            columns: 查询的列，不是全部列时返回LazyArticle
+        """
+        self._decode_article_json(data)
         
-        return Article(**data)
+        if columns is None or len(columns) == len(ARTICLE_COLUMNS):
+            return Article(**data)
+
+        article = LazyArticle(**data)
+        article.__dict__['_loader'] = self._load_article_columns
+        article.__dict__['_missing'] = set(ARTICLE_COLUMNS) - set(columns)
+        return article
     
     def _dict_to_publish_task(self, data: Dict) -> PublishTask:
         """将字典转换为PublishTask对象"""
@@ -586,12 +1327,14 @@ def migrate_from_wechat_articles(db_manager: UnifiedDatabaseManager) -> int:
         """
 
         old_articles = db_manager.execute_query(select_sql)
-        migrated_count = 0
 
+        # 一次IN查询找出已迁移的文章，不再逐条查询
+        existing = db_manager.get_article_ids_by_urls(SourceType.WECHAT.value,
+                                                      [a['article_url'] for a in old_articles])
+        articles = []
         for old_article in old_articles:
             # 检查是否已存在
-            existing = db_manager.get_article_by_url('wechat', old_article['article_url'])
-            if existing:
+            if old_article['article_url'] in existing:
                 continue
 
             # 转换状态
@@ -602,7 +1345,7 @@ def migrate_from_wechat_articles(db_manager: UnifiedDatabaseManager) -> int:
                 crawl_status = CrawlStatus.FAILED.value
 
             # 创建新文章对象
-            article = Article(
+            articles.append(Article(
                 source_type=SourceType.WECHAT.value,
                 source_name=old_article['account_name'],
                 title=old_article['title'],
@@ -616,11 +1359,11 @@ def migrate_from_wechat_articles(db_manager: UnifiedDatabaseManager) -> int:
                 crawl_error=old_article.get('error_message'),
                 crawled_at=old_article.get('crawled_at'),
                 fetched_at=old_article.get('fetched_at')
-            )
+            ))
 
-            # 插入新表
-            db_manager.insert_article(article)
-            migrated_count += 1
+        # 分块批量插入新表，正文较大，每块行数少一些
+        outcomes = db_manager.insert_articles_bulk(articles, chunk_size=50)
+        migrated_count = sum(1 for outcome, _ in outcomes if outcome == 'inserted')
 
         logger.info(f"成功迁移{migrated_count}条记录")
         return migrated_count
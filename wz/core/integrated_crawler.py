@@ -387,41 +387,48 @@ class IntegratedCrawler:
         logger.info(f"开始根据URL列表采集 - 数量: {len(urls)}")
         
         results = []
-        
-        for url in urls:
+
+        # 批量创建文章记录，已存在的跳过，一次往返完成存在性检查和插入
+        articles = [
+            Article(
+                source_type=source_type,
+                source_name=source_name,
+                title=f"待采集文章 - {url}",
+                article_url=url,
+                crawl_status=CrawlStatus.PENDING.value
+            )
+            for url in urls
+        ]
+        try:
+            outcomes = self.db_manager.insert_articles_bulk(articles)
+        except Exception as e:
+            logger.error(f"批量创建文章记录失败: {e}")
+            outcomes = []
+            results = [{'url': url, 'status': 'error', 'error': str(e)} for url in urls]
+
+        for article, (outcome, article_id) in zip(articles, outcomes):
+            url = article.article_url
+            if outcome == 'skipped':
+                logger.info(f"文章已存在，跳过: {url}")
+                results.append({
+                    'url': url,
+                    'status': 'skipped',
+                    'reason': '文章已存在'
+                })
+                continue
+
             try:
-                # 检查是否已存在
-                existing_article = self.db_manager.get_article_by_url(source_type, url)
-                if existing_article:
-                    logger.info(f"文章已存在，跳过: {url}")
-                    results.append({
-                        'url': url,
-                        'status': 'skipped',
-                        'reason': '文章已存在'
-                    })
-                    continue
-                
-                # 创建新文章记录
-                article = Article(
-                    source_type=source_type,
-                    source_name=source_name,
-                    title=f"待采集文章 - {url}",
-                    article_url=url,
-                    crawl_status=CrawlStatus.PENDING.value
-                )
-                
-                article_id = self.db_manager.insert_article(article)
                 article.id = article_id
-                
+
                 # 立即采集
                 success = self.crawl_single_article(article)
-                
+
                 results.append({
                     'url': url,
                     'status': 'success' if success else 'failed',
                     'article_id': article_id
                 })
-                
+
             except Exception as e:
                 logger.error(f"处理URL失败: {url} - {e}")
                 results.append({
@@ -9,6 +9,7 @@ import os
 import sys
 import json
 import logging
+import argparse
 import datetime
 from pathlib import Path
 
@@ -272,6 +273,58 @@ class DatabaseMigrator:
             self.log_step("VALIDATE", f"验证失败: {e}", success=False)
             return False
     
+    def apply_publish_state_schema(self):
+        """执行sql/004_article_publish_state.sql：创建发布状态表和索引，并从publish_status回填"""
+        logger.info("=== 创建发布状态表 ===")
+        return self._apply_sql_file("004_article_publish_state.sql", "PUBLISH_STATE", "回填了{}条发布状态")
+    
+    def apply_url_hash_schema(self):
+        """执行sql/005_article_url_hash.sql：唯一键改为按完整URL的哈希比较"""
+        logger.info("=== 修改文章URL唯一键 ===")
+        return self._apply_sql_file("005_article_url_hash.sql", "URL_HASH")
+    
+    def _apply_sql_file(self, file_name, step, insert_message="插入了{}行"):
+        """逐条执行sql目录下的脚本，SELECT语句作为验证输出；重复执行时已存在的索引、列跳过"""
+        try:
+            sql_file = project_root / "sql" / file_name
+            
+            if not sql_file.exists():
+                raise Exception(f"SQL文件不存在: {sql_file}")
+            
+            with open(sql_file, 'r', encoding='utf-8') as f:
+                sql_content = f.read()
+            
+            # 去掉注释行后分割SQL语句（回滚语句都在注释中，不会执行）
+            lines = [line for line in sql_content.splitlines() if not line.strip().startswith('--')]
+            sql_statements = [stmt.strip() for stmt in '\n'.join(lines).split(';') if stmt.strip()]
+            
+            for statement in sql_statements:
+                head = statement.upper()
+                try:
+                    if head.startswith('SELECT'):
+                        result = self.db.query(statement)
+                        if result:
+                            self.log_step(step, f"验证: {result[0]}")
+                        continue
+                    self.db.cursor.execute(statement)
+                    if head.startswith('INSERT'):
+                        self.log_step(step, insert_message.format(self.db.cursor.rowcount))
+                    else:
+                        self.log_step(step, f"执行: {statement.splitlines()[0][:60]}")
+                except Exception as e:
+                    # 重复执行时索引、列已存在，跳过
+                    message = str(e).lower()
+                    if "duplicate key name" in message or "duplicate column name" in message:
+                        self.log_step(step, f"已执行过，跳过: {statement[:50]}...")
+                    else:
+                        raise e
+            
+            return True
+            
+        except Exception as e:
+            self.log_step(step, f"执行{file_name}失败: {e}", success=False)
+            return False
+    
     def create_compatibility_view(self):
         """创建兼容性视图"""
         logger.info("=== 创建兼容性视图 ===")
@@ -335,8 +388,27 @@ def main():
     print("WZ项目数据库迁移工具")
     print("=" * 60)
     
+    parser = argparse.ArgumentParser(description="WZ项目数据库迁移工具")
+    parser.add_argument('--publish-state', action='store_true',
+                        help='只执行sql/004_article_publish_state.sql，用于已完成迁移的数据库')
+    parser.add_argument('--url-hash', action='store_true',
+                        help='只执行sql/005_article_url_hash.sql，用于已完成迁移的数据库')
+    args = parser.parse_args()
+    
     migrator = DatabaseMigrator()
     
+    if args.publish_state or args.url_hash:
+        try:
+            if not migrator.db.connect():
+                print("无法连接到数据库")
+                return False
+            if args.url_hash and not migrator.apply_url_hash_schema():
+                return False
+            return not args.publish_state or migrator.apply_publish_state_schema()
+        finally:
+            migrator.save_migration_log()
+            migrator.db.disconnect()
+    
     try:
         # 1. 检查前提条件
         if not migrator.check_prerequisites():
@@ -364,7 +436,11 @@ def main():
             print("迁移验证失败，请检查数据")
             return False
         
-        # 6. 创建兼容性视图
+        # 6. 创建发布状态表（get_articles_for_publish等使用）
+        if not migrator.apply_publish_state_schema():
+            print("创建发布状态表失败，可稍后执行 python scripts/migrate_database.py --publish-state")
+        
+        # 7. 创建兼容性视图
         migrator.create_compatibility_view()
         
         print("\n" + "=" * 60)
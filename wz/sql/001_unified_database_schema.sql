@@ -18,6 +18,7 @@ CREATE TABLE `articles` (
   -- 基本信息
   `title` VARCHAR(512) NOT NULL COMMENT '文章标题',
   `article_url` VARCHAR(1024) NOT NULL COMMENT '文章原始链接',
+  `article_url_hash` BINARY(20) AS (UNHEX(SHA1(`article_url`))) STORED COMMENT '完整文章链接的SHA1',
   `author` VARCHAR(255) DEFAULT NULL COMMENT '作者',
   `publish_timestamp` DATETIME DEFAULT NULL COMMENT '文章发布时间',
   
@@ -49,7 +50,7 @@ CREATE TABLE `articles` (
   `created_at` TIMESTAMP DEFAULT CURRENT_TIMESTAMP COMMENT '记录创建时间',
   
   PRIMARY KEY (`id`),
-  UNIQUE KEY `uk_source_url` (`source_type`, `article_url`(255)),
+  UNIQUE KEY `uk_source_url` (`source_type`, `article_url_hash`),
   INDEX `idx_source_type` (`source_type`),
   INDEX `idx_source_name` (`source_name`),
   INDEX `idx_crawl_status` (`crawl_status`),
@@ -0,0 +1,84 @@
+-- WZ项目发布队列索引
+-- 版本: 1.1
+-- 创建时间: 2026-10-20
+-- 说明: get_articles_for_publish 原来在 WHERE 中对 publish_status 做 JSON_EXTRACT，无法使用索引，
+--       每次都要扫描所有已采集的文章。这里把每篇文章在每个平台的发布状态拆成单独的一行，
+--       并为 publish_platforms 中登记的每个平台物化待发布的行：已采集完成、在该平台没有发布状态的文章
+--       写入一行 pending。待发布文章直接按 (platform, status, crawled_at, article_id) 索引顺序读取前 N 行，
+--       不再扫描已发布的文章。
+--       articles.publish_status 保留，由 UnifiedDatabaseManager 同步写入两处；
+--       pending 与没有状态等价，本表中未采集完成的文章不保留 pending 行。
+
+-- ============================================================================
+-- 1. 文章发布状态表
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS `article_publish_state` (
+  `article_id` BIGINT UNSIGNED NOT NULL COMMENT '文章ID',
+  `platform` VARCHAR(64) NOT NULL COMMENT '发布平台，与publish_status中的键相同',
+  `status` VARCHAR(32) NOT NULL COMMENT '发布状态: pending/processing/completed/failed/cancelled',
+  `crawled_at` TIMESTAMP NULL DEFAULT NULL COMMENT '文章采集完成时间，与articles.crawled_at相同，待发布队列按其排序',
+  `updated_at` TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+
+  PRIMARY KEY (`article_id`, `platform`),
+  INDEX `idx_publish_queue` (`platform`, `status`, `crawled_at`, `article_id`),
+  FOREIGN KEY (`article_id`) REFERENCES `articles`(`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='文章发布状态表';
+
+-- ============================================================================
+-- 2. 物化待发布行的平台，get_articles_for_publish 首次查询某个平台时自动登记并回填
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS `publish_platforms` (
+  `platform` VARCHAR(64) NOT NULL COMMENT '发布平台',
+  `created_at` TIMESTAMP DEFAULT CURRENT_TIMESTAMP COMMENT '登记时间',
+
+  PRIMARY KEY (`platform`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='待发布队列的平台';
+
+-- ============================================================================
+-- 3. 未执行本脚本时，JSON_EXTRACT 回退查询按采集时间顺序扫描的索引
+-- ============================================================================
+
+ALTER TABLE `articles` ADD INDEX `idx_crawl_status_crawled_at` (`crawl_status`, `crawled_at`, `id`);
+
+-- ============================================================================
+-- 4. 从 publish_status 回填（需要 MySQL 8.0 的 JSON_TABLE）
+-- ============================================================================
+
+INSERT IGNORE INTO `article_publish_state` (`article_id`, `platform`, `status`, `crawled_at`)
+SELECT
+    a.id,
+    k.platform,
+    JSON_UNQUOTE(JSON_EXTRACT(a.publish_status, CONCAT('$."', k.platform, '"'))),
+    a.crawled_at
+FROM articles a,
+     JSON_TABLE(JSON_KEYS(a.publish_status), '$[*]' COLUMNS (`platform` VARCHAR(64) PATH '$')) k
+WHERE a.publish_status IS NOT NULL
+AND (a.crawl_status = 'completed'
+     OR JSON_UNQUOTE(JSON_EXTRACT(a.publish_status, CONCAT('$."', k.platform, '"'))) != 'pending');
+
+-- 已有发布状态的平台都登记为待发布队列的平台
+INSERT IGNORE INTO `publish_platforms` (`platform`)
+SELECT DISTINCT `platform` FROM `article_publish_state`;
+
+-- 为登记的平台物化待发布行
+INSERT IGNORE INTO `article_publish_state` (`article_id`, `platform`, `status`, `crawled_at`)
+SELECT a.id, p.platform, 'pending', a.crawled_at
+FROM articles a CROSS JOIN publish_platforms p
+WHERE a.crawl_status = 'completed';
+
+-- 5. 验证：非pending的状态数量两处应一致
+SELECT
+    (SELECT COUNT(*) FROM article_publish_state WHERE status != 'pending') AS state_rows,
+    (SELECT COUNT(*) FROM articles a,
+            JSON_TABLE(JSON_KEYS(a.publish_status), '$[*]' COLUMNS (`platform` VARCHAR(64) PATH '$')) k
+     WHERE a.publish_status IS NOT NULL
+     AND JSON_UNQUOTE(JSON_EXTRACT(a.publish_status, CONCAT('$."', k.platform, '"'))) != 'pending') AS json_entries;
+
+-- ============================================================================
+-- 回滚
+-- ============================================================================
+-- DROP TABLE IF EXISTS `article_publish_state`;
+-- DROP TABLE IF EXISTS `publish_platforms`;
+-- ALTER TABLE `articles` DROP INDEX `idx_crawl_status_crawled_at`;
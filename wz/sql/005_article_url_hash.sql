@@ -0,0 +1,28 @@
+-- WZ项目文章URL唯一键
+-- 版本: 1.1
+-- 创建时间: 2026-10-21
+-- 说明: uk_source_url 原来是 (source_type, article_url(255))，只比较URL的前255个字符：
+--       前缀相同的两个长URL被当作同一篇文章，批量写入时按完整URL查询已存在的文章又查不到，
+--       返回的结果（inserted/updated）和文章ID都不对。
+--       这里增加由完整URL计算的 SHA1 生成列，唯一键改为 (source_type, article_url_hash)，
+--       UnifiedDatabaseManager 按 article_url_hash 查询文章。
+
+-- ============================================================================
+-- 1. 完整URL的哈希列，唯一键改为按哈希比较
+-- ============================================================================
+
+ALTER TABLE `articles`
+  ADD COLUMN `article_url_hash` BINARY(20) AS (UNHEX(SHA1(`article_url`))) STORED COMMENT '完整文章链接的SHA1' AFTER `article_url`,
+  DROP INDEX `uk_source_url`,
+  ADD UNIQUE KEY `uk_source_url` (`source_type`, `article_url_hash`);
+
+-- 2. 验证：哈希列与URL一一对应
+SELECT
+    (SELECT COUNT(*) FROM articles) AS articles,
+    (SELECT COUNT(DISTINCT source_type, article_url_hash) FROM articles) AS distinct_url_hashes;
+
+-- ============================================================================
+-- 回滚（回滚前需确认没有前255个字符相同的URL）
+-- ============================================================================
+-- ALTER TABLE `articles` DROP INDEX `uk_source_url`, DROP COLUMN `article_url_hash`,
+--   ADD UNIQUE KEY `uk_source_url` (`source_type`, `article_url`(255));
@@ -14,7 +14,7 @@ from pathlib import Path
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
-from core.database import UnifiedDatabaseManager, Article, PublishTask, SourceType, CrawlStatus, PublishStatus
+from core.database import UnifiedDatabaseManager, Article, LazyArticle, PublishTask, SourceType, CrawlStatus, PublishStatus
 from core.config import UnifiedConfig
 
 class TestUnifiedDatabaseManager(unittest.TestCase):
@@ -233,6 +233,208 @@ class TestUnifiedDatabaseManager(unittest.TestCase):
         found_article = any(a.id == article_id for a in articles_for_publish)
         self.assertTrue(found_article)  # 00077_top平台还没有发布状态，应该在待发布列表中
     
+    def test_bulk_insert_and_upsert(self):
+        """测试批量插入和批量插入或更新"""
+        articles = [
+            Article(
+                source_type=SourceType.WECHAT.value,
+                source_name="测试公众号",
+                title=f"TEST_批量文章_{i}",
+                article_url=f"https://test.example.com/bulk/{i}",
+                word_count=i
+            )
+            for i in range(5)
+        ]
+
+        # 先单独插入一篇，批量插入时应跳过
+        existing_id = self.db_manager.insert_article(articles[0])
+        outcomes = self.db_manager.insert_articles_bulk(articles + [articles[1]], chunk_size=2)
+        self.assertEqual([o for o, _ in outcomes], ['skipped', 'inserted', 'inserted', 'inserted', 'inserted', 'skipped'])
+        self.assertEqual(outcomes[0][1], existing_id)
+        self.assertEqual(outcomes[1][1], outcomes[5][1])
+        self.assertEqual(len({article_id for _, article_id in outcomes}), 5)
+
+        # 批量检查存在性
+        urls = [a.article_url for a in articles] + ["https://test.example.com/bulk/not_exist"]
+        existing = self.db_manager.get_article_ids_by_urls(SourceType.WECHAT.value, urls)
+        self.assertEqual(set(existing), set(urls[:5]))
+
+        # 批量更新已存在的文章，新文章直接插入
+        for a in articles:
+            a.word_count = 1000
+        articles.append(Article(
+            source_type=SourceType.WECHAT.value,
+            source_name="测试公众号",
+            title="TEST_批量文章_new",
+            article_url="https://test.example.com/bulk/new",
+            word_count=1000
+        ))
+        outcomes = self.db_manager.upsert_articles_bulk(articles, chunk_size=4)
+        self.assertEqual([o for o, _ in outcomes], ['updated'] * 5 + ['inserted'])
+        self.assertEqual(outcomes[0][1], existing_id)
+        self.assertEqual(self.db_manager.get_article_by_id(existing_id).word_count, 1000)
+
+        # 批量创建发布任务
+        tasks = [PublishTask(article_id=article_id, target_platform="8wf_net") for _, article_id in outcomes]
+        task_ids = self.db_manager.create_publish_tasks_bulk(tasks, chunk_size=4)
+        self.assertEqual(len(set(task_ids)), len(tasks))
+        rows = self.db_manager.execute_query(
+            "SELECT id, article_id FROM publish_tasks WHERE id IN ({})".format(', '.join(['%s'] * len(task_ids))),
+            tuple(task_ids))
+        self.assertEqual({r['id']: r['article_id'] for r in rows},
+                         {task_id: t.article_id for task_id, t in zip(task_ids, tasks)})
+
+    def test_long_url_prefix(self):
+        """测试前255个字符相同的长URL是不同的文章（需要执行sql/005_article_url_hash.sql）"""
+        prefix = "https://test.example.com/long/" + "a" * 300
+        articles = [
+            Article(
+                source_type=SourceType.WECHAT.value,
+                source_name="测试公众号",
+                title=f"TEST_长链接_{i}",
+                article_url=f"{prefix}?i={i}"
+            )
+            for i in range(2)
+        ]
+        outcomes = self.db_manager.insert_articles_bulk(articles)
+        self.assertEqual([o for o, _ in outcomes], ['inserted', 'inserted'])
+        self.assertNotEqual(outcomes[0][1], outcomes[1][1])
+
+        self.assertEqual(self.db_manager.get_article_ids_by_urls(SourceType.WECHAT.value, [a.article_url for a in articles]),
+                         {a.article_url: article_id for a, (_, article_id) in zip(articles, outcomes)})
+        self.assertEqual(self.db_manager.get_article_by_url(SourceType.WECHAT.value, articles[1].article_url).id,
+                         outcomes[1][1])
+
+    def test_publish_status_atomic_update(self):
+        """测试并发更新不同平台的发布状态不会互相覆盖，以及批量更新"""
+        from concurrent.futures import ThreadPoolExecutor
+
+        article_ids = [
+            self.db_manager.insert_article(Article(
+                source_type=SourceType.WECHAT.value,
+                source_name="测试公众号",
+                title=f"TEST_发布状态并发_{i}",
+                article_url=f"https://test.example.com/status_atomic/{i}",
+                crawl_status=CrawlStatus.COMPLETED.value
+            ))
+            for i in range(3)
+        ]
+
+        platforms = [f"platform_{i}" for i in range(8)]
+        with ThreadPoolExecutor(max_workers=len(platforms)) as executor:
+            list(executor.map(lambda p: self.db_manager.update_publish_status(article_ids[0], p, "completed"),
+                              platforms))
+        publish_status = self.db_manager.get_article_by_id(article_ids[0]).publish_status
+        self.assertEqual(publish_status, {p: "completed" for p in platforms})
+
+        # 批量标记，已有的其他平台状态保持不变
+        updated = self.db_manager.update_publish_status_bulk(article_ids, "8wf_net", "pending")
+        self.assertEqual(updated, 3)
+        for article_id in article_ids:
+            self.assertEqual(self.db_manager.get_article_by_id(article_id).publish_status["8wf_net"], "pending")
+        self.assertEqual(self.db_manager.get_article_by_id(article_ids[0]).publish_status["platform_0"], "completed")
+
+        # 文章不存在时不影响任何行，非法平台名直接拒绝
+        self.assertEqual(self.db_manager.update_publish_status(-1, "8wf_net", "completed"), 0)
+        with self.assertRaises(ValueError):
+            self.db_manager.update_publish_status(article_ids[0], "8wf_net\"') OR 1=1 -- ", "completed")
+
+    def test_publish_queue(self):
+        """测试按平台取待发布文章：跳过已发布的，按采集时间顺序分页（需要执行sql/004_article_publish_state.sql）"""
+        article_ids = []
+        for i in range(4):
+            article_id = self.db_manager.insert_article(Article(
+                source_type=SourceType.WECHAT.value,
+                source_name="测试公众号",
+                title=f"TEST_发布队列_{i}",
+                article_url=f"https://test.example.com/queue/{i}",
+                crawl_status=CrawlStatus.COMPLETED.value,
+                crawled_at=datetime(2000, 1, 1, 0, i)
+            ))
+            article_ids.append(article_id)
+
+        self.db_manager.update_publish_status(article_ids[1], "8wf_net", "completed")
+        self.db_manager.update_publish_status(article_ids[2], "8wf_net", "pending")
+        self.db_manager.update_publish_status(article_ids[3], "1rmb_net", "completed")
+
+        # 只看本测试的文章（crawled_at 在 2000 年，排在其他数据前面）
+        def queue(platform, **kwargs):
+            return [a.id for a in self.db_manager.get_articles_for_publish(platform, **kwargs) if a.id in article_ids]
+
+        self.assertEqual(queue("8wf_net"), [article_ids[0], article_ids[2], article_ids[3]])
+        self.assertEqual(queue("1rmb_net"), article_ids[:3])
+
+        # 分页：从上一页最后一篇之后继续
+        next_page = queue("8wf_net", limit=2, after=(datetime(2000, 1, 1, 0, 0), article_ids[0]))
+        self.assertEqual(next_page, [article_ids[2], article_ids[3]])
+
+        # update_article整体替换发布状态后队列随之变化
+        article = self.db_manager.get_article_by_id(article_ids[1])
+        article.publish_status = {"1rmb_net": "completed"}
+        self.db_manager.update_article(article)
+        self.assertIn(article_ids[1], queue("8wf_net"))
+        self.assertNotIn(article_ids[1], queue("1rmb_net"))
+
+        # 批量更新publish_status同样整体替换，移除的平台重新进入队列
+        article.publish_status = {"8wf_net": "completed"}
+        outcomes = self.db_manager.upsert_articles_bulk([article], update_columns=["publish_status"])
+        self.assertEqual(outcomes, [("updated", article_ids[1])])
+        self.assertNotIn(article_ids[1], queue("8wf_net"))
+        self.assertIn(article_ids[1], queue("1rmb_net"))
+
+        # 平台登记之后采集完成的文章进入队列，重新采集时移出（crawled_at为当前时间，排在其他数据后面）
+        article_id = self.db_manager.insert_article(Article(
+            source_type=SourceType.WECHAT.value,
+            source_name="测试公众号",
+            title="TEST_发布队列_采集中",
+            article_url="https://test.example.com/queue/crawling",
+            crawl_status=CrawlStatus.CRAWLING.value
+        ))
+        article_ids.append(article_id)
+        self.assertNotIn(article_id, queue("8wf_net", limit=10000))
+        self.db_manager.update_crawl_status(article_id, CrawlStatus.COMPLETED.value, content="正文")
+        self.assertIn(article_id, queue("8wf_net", limit=10000))
+        self.db_manager.update_crawl_status(article_id, CrawlStatus.FAILED.value, error_message="重新采集失败")
+        self.assertNotIn(article_id, queue("8wf_net", limit=10000))
+
+    def test_article_projection(self):
+        """测试按视图读取文章：summary不读取LONGTEXT列，访问时再补齐"""
+        article_id = self.db_manager.insert_article(Article(
+            source_type=SourceType.WECHAT.value,
+            source_name="测试公众号",
+            title="TEST_按需读取正文",
+            article_url="https://test.example.com/projection",
+            content="正文" * 1000,
+            content_html="<p>正文</p>",
+            tags=["测试"]
+        ))
+
+        summary = self.db_manager.get_article_by_id(article_id, fields="summary")
+        self.assertIsInstance(summary, LazyArticle)
+        self.assertNotIn("content", summary.loaded_columns)
+        self.assertEqual(summary.title, "TEST_按需读取正文")
+        self.assertEqual(summary.tags, ["测试"])
+
+        # 首次访问时一次补齐全部未读取的列
+        self.assertEqual(summary.content, "正文" * 1000)
+        self.assertEqual(summary.content_html, "<p>正文</p>")
+        self.assertIn("ai_content", summary.loaded_columns)
+
+        # 指定列读取，id总是包含在内
+        partial = self.db_manager.get_article_by_url(SourceType.WECHAT.value, "https://test.example.com/projection",
+                                                     fields=["title"])
+        self.assertEqual(partial.id, article_id)
+        self.assertEqual(partial.loaded_columns, ["id", "title"])
+
+        # 未读取的列被赋值后，update_article不会用数据库中的旧值覆盖
+        partial.content = "新正文"
+        self.db_manager.update_article(partial)
+        self.assertEqual(self.db_manager.get_article_by_id(article_id).content, "新正文")
+
+        self.assertNotIsInstance(self.db_manager.get_article_by_id(article_id), LazyArticle)
+        with self.assertRaises(ValueError):
+            self.db_manager.get_article_by_id(article_id, fields=["not_a_column"])
+
     def test_statistics(self):
         """测试统计功能"""
         # 创建测试数据
@@ -349,6 +551,33 @@ class TestDatabaseIntegration(unittest.TestCase):
         # 上下文结束后连接应该关闭
         self.assertIsNone(db.connection)
 
+    def test_connection_pool_concurrency(self):
+        """测试多线程共享连接池，连接数不超过上限"""
+        from concurrent.futures import ThreadPoolExecutor
+
+        with UnifiedDatabaseManager(self.config) as db:
+            pool = db.connection
+            with ThreadPoolExecutor(max_workers=pool.max_size * 2) as executor:
+                results = list(executor.map(lambda i: db.execute_query("SELECT %s as n, SLEEP(0.05)", (i,))[0]["n"],
+                                            range(pool.max_size * 4)))
+            self.assertEqual(results, list(range(pool.max_size * 4)))
+            stats = pool.stats()
+            self.assertEqual(stats["in_use"], 0)
+            self.assertLessEqual(stats["idle"], pool.pool_size)
+
+    def test_stale_connection_reconnect(self):
+        """测试连接被服务端断开后自动重建"""
+        with UnifiedDatabaseManager(self.config) as db:
+            db.connection.pre_ping = 0
+            connection_id = db.execute_query("SELECT CONNECTION_ID() as id")[0]["id"]
+
+            # 用另一个连接杀掉池中的空闲连接，模拟wait_timeout断开
+            with UnifiedDatabaseManager(self.config) as other:
+                other.execute_update("KILL %s", (connection_id,))
+
+            result = db.execute_query("SELECT CONNECTION_ID() as id")
+            self.assertNotEqual(result[0]["id"], connection_id)
+
 if __name__ == "__main__":
     # 运行测试
     unittest.main(verbosity=2)
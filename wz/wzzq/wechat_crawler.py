@@ -7,9 +7,9 @@
 
 import json
 import requests
-import time
 from tqdm import tqdm
 import logging # 新增: 用于日志记录
+from wechat_throttle import TokenBucket
 
 from .utils import load_auth_info, load_wechat_accounts, jstime_to_datetime, DEFAULT_HEADERS, save_wechat_accounts
 
@@ -17,6 +17,9 @@ from .utils import load_auth_info, load_wechat_accounts, jstime_to_datetime, DEF
 logger = logging.getLogger(__name__)
 # (如果需要，可以在这里添加handler和formatter，但通常由调用方配置)
 
+# 后台接口触发频率控制时返回的ret
+FREQ_CONTROL_RETS = {200013}
+
 # 1.1. 定义自定义异常类
 class CredentialsExpiredError(Exception):
     pass
@@ -42,6 +45,9 @@ class WechatCrawler:
             
         # 加载公众号列表
         self.accounts = load_wechat_accounts()
+
+        # 后台接口限速，每次请求前取令牌，成功时加性提速，freq control时乘性降速并暂停
+        self.limiter = TokenBucket()
         
     # 1.2. 添加新的私有方法 _check_credential_status
     def _check_credential_status(self, response_json, api_name="API"):
@@ -60,11 +66,15 @@ class WechatCrawler:
             logger.warning(f"{api_name}: 凭据已失效 (ret: {ret_code}, msg: {err_msg}). 请更新凭据。")
             raise CredentialsExpiredError(f"凭据已失效 (ret: {ret_code}): {err_msg}")
         
-        if err_msg == 'freq control' or 'freq control' in err_msg: # 更灵活的频率控制检查
+        if ret_code in FREQ_CONTROL_RETS or 'freq control' in err_msg: # 更灵活的频率控制检查
             logger.warning(f"{api_name}: 请求频率过快 (ret: {ret_code}, msg: {err_msg}). 请稍后再试。")
+            self.limiter.on_throttle()
             raise RateLimitError(f"请求频率过快 (ret: {ret_code}): {err_msg}")
 
-        if ret_code != 0:
+        # 只有真正成功的请求才提速，其他错误既不提速也不降速
+        if ret_code == 0:
+            self.limiter.on_success()
+        else:
             logger.warning(f"{api_name}: API调用失败 (ret: {ret_code}, msg: {err_msg}).")
             # 对于其他非0的ret_code，可以抛出通用异常，或者让调用方根据具体业务处理
             # raise Exception(f"{api_name} 调用失败 (ret: {ret_code}): {err_msg}")
@@ -72,6 +82,15 @@ class WechatCrawler:
             # 为了保持与原逻辑的兼容性（即ret!=0时返回空列表或None），这里可以仅记录日志而不抛出通用异常
             # 调用方通常会检查期望的数据是否存在于response_json中
 
+    def get_rate_budget(self):
+        """
+        获取当前的请求预算
+        
+        Returns:
+            dict: rate(每秒请求数), tokens(可立即使用的令牌数), capacity(桶容量), blocked_for(限频暂停剩余秒数)
+        """
+        return self.limiter.budget()
+
     def is_authenticated(self):
         """
         检查是否已认证
@@ -109,6 +128,7 @@ class WechatCrawler:
         
         url = 'https://mp.weixin.qq.com/cgi-bin/searchbiz?'
         try:
+            self.limiter.acquire()
             response = requests.get(url=url, params=params, headers=self.headers)
             response.raise_for_status() # 检查HTTP错误
             response_json = response.json()
@@ -194,6 +214,7 @@ class WechatCrawler:
         url = "https://mp.weixin.qq.com/cgi-bin/appmsgpublish?"
         
         try:
+            self.limiter.acquire()
             response = requests.get(url=url, params=params, headers=self.headers)
             response.raise_for_status() # 检查HTTP错误
             response_json = response.json()
@@ -299,8 +320,6 @@ class WechatCrawler:
             # 添加到总列表
             all_articles.extend(articles)
             
-            # 防止请求频率过快
-            time.sleep(1)
-            
         print(f"抓取完成，共获取{len(all_articles)}篇文章")
+        logger.info(f"当前请求预算: {self.get_rate_budget()}")
         return all_articles
\ No newline at end of file